@@ -0,0 +1,323 @@
+"""
+Benchmarks for the analysis pipeline.
+
+    cd backend
+    python -m benchmarks.bench --out bench.json                  # all suites
+    python -m benchmarks.bench --suites stages --sizes 1,12      # just the per-stage matrix
+
+Suites:
+  stages   MorphologyEngine per-stage timings over a matrix of image sizes, formats and EXIF rotations
+  metrics  the scoring kernel alone, on stored landmarks (--store) or a perturbed synthetic mesh
+  load     end-to-end POST /analyze throughput and latency percentiles under concurrent clients
+
+Inputs are drawn with engine.synthetic, so everything runs offline. Results are written as JSON together
+with the git commit and MORPH_* settings, so runs from two commits can be diffed.
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from engine.decode import DEFAULT_MAX_SIDE, decode_image
+from engine.metrics import build_report, build_reports, compute_metrics
+from engine.synthetic import encode_image, synthetic_face
+from engine.quality import measure_image
+from engine.telemetry import STAGES, stage
+from engine.version import ENGINE_VERSION
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Megapixels -> portrait (w, h) at 3:4, the shape phone cameras produce.
+SIZES = {1: (864, 1152), 12: (3000, 4000), 48: (6000, 8000)}
+FORMATS = {
+    "jpeg": ("JPEG", {"quality": 90}),
+    "png": ("PNG", {"compress_level": 1}),
+    "webp": ("WEBP", {"quality": 90}),
+}
+
+
+def summarize(seconds: Sequence[float]) -> Dict[str, float]:
+    """Latency distribution in milliseconds."""
+    ms = np.asarray(seconds, dtype=np.float64) * 1000.0
+    if ms.size == 0:
+        return {}
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {
+        "n": int(ms.size), "mean": round(float(ms.mean()), 3), "min": round(float(ms.min()), 3),
+        "p50": round(float(p50), 3), "p95": round(float(p95), 3), "p99": round(float(p99), 3),
+        "max": round(float(ms.max()), 3),
+    }
+
+
+def run_info() -> Dict[str, Any]:
+    def git(*args):
+        try:
+            return subprocess.run(["git", *args], cwd=BACKEND_DIR, capture_output=True, text=True,
+                                  check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    status = git("status", "--porcelain", "--untracked-files=no")
+    return {
+        "commit": git("rev-parse", "HEAD"),
+        "dirty": bool(status) if status is not None else None,
+        "engineVersion": ENGINE_VERSION,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpuCount": os.cpu_count(),
+        "env": {k: v for k, v in sorted(os.environ.items()) if k.startswith("MORPH_")},
+    }
+
+
+# --- stages --------------------------------------------------------------------------------------
+
+def bench_stages(sizes: Sequence[int], formats: Sequence[str], orientations: Sequence[int],
+                 repeat: int, warmup: int, max_side: int = DEFAULT_MAX_SIDE) -> List[Dict[str, Any]]:
+    from engine.morphology import MorphologyEngine
+    engine = MorphologyEngine(max_side=max_side)
+    results = []
+    try:
+        for mp in sizes:
+            face = synthetic_face(*SIZES[mp])
+            for fmt in formats:
+                pil_format, options = FORMATS[fmt]
+                for orientation in orientations:
+                    data = encode_image(face, pil_format, orientation, **options)
+                    runs, totals, detected = [], [], False
+                    for i in range(warmup + repeat):
+                        timings: Dict[str, float] = {}
+                        start = time.perf_counter()
+                        image, size = decode_image(data, engine.max_side, timings)
+                        with stage(timings, "quality"):
+                            quality = measure_image(image, size)
+                        analysis = engine.analyze_frame(image, size, timings, quality, gate="flag")
+                        elapsed = time.perf_counter() - start
+                        if i >= warmup:
+                            runs.append(timings)
+                            totals.append(elapsed)
+                            detected = analysis is not None
+                    results.append({
+                        "megapixels": mp, "format": fmt, "orientation": orientation, "bytes": len(data),
+                        "faceDetected": detected,
+                        "total": summarize(totals),
+                        "stages": {s: summarize([r[s] for r in runs if s in r]) for s in STAGES if any(s in r for r in runs)},
+                    })
+                    print(f"  stages {mp:>2}MP {fmt:<4} exif={orientation}: p50 {results[-1]['total']['p50']:.1f} ms",
+                          file=sys.stderr)
+    finally:
+        engine.close()
+    return results
+
+
+# --- metrics -------------------------------------------------------------------------------------
+
+def synthetic_landmarks(count: int, seed: int = 0):
+    """`count` plausible meshes: the synthetic face's mesh with per-face jitter (~1% of face width)."""
+    from engine.morphology import MorphologyEngine
+    engine = MorphologyEngine()
+    try:
+        analysis = engine.analyze(encode_image(synthetic_face(600, 800)), gate="flag")
+    finally:
+        engine.close()
+    if analysis is None:
+        raise RuntimeError("No face found in the synthetic image")
+    rng = np.random.default_rng(seed)
+    landmarks = analysis.landmarks[None] + rng.normal(0, 0.004, (count, 478, 3)).astype(np.float32)
+    sizes = np.tile(np.asarray(analysis.size, dtype=np.int32), (count, 1))
+    return landmarks, sizes
+
+
+def bench_metrics(landmarks: np.ndarray, sizes: np.ndarray, single: int = 2000) -> Dict[str, Any]:
+    # Per request: one face through the kernel and the report builder, as the engine does it.
+    per_face = []
+    for i in range(min(single, len(landmarks))):
+        start = time.perf_counter()
+        build_report(compute_metrics(landmarks[i], sizes[i]))
+        per_face.append(time.perf_counter() - start)
+
+    # Offline re-scoring: the whole set in one vectorized call.
+    start = time.perf_counter()
+    m = compute_metrics(landmarks, sizes)
+    kernel = time.perf_counter() - start
+    start = time.perf_counter()
+    build_reports(m)
+    reports = time.perf_counter() - start
+
+    return {
+        "faces": int(len(landmarks)),
+        "perFace": summarize(per_face),
+        "batch": {
+            "kernelSeconds": round(kernel, 4),
+            "reportSeconds": round(reports, 4),
+            "facesPerSecond": round(len(landmarks) / kernel, 1) if kernel else None,
+        },
+    }
+
+
+# --- load ----------------------------------------------------------------------------------------
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port: int, timeout: float = 120.0) -> subprocess.Popen:
+    """Runs the API under uvicorn in a child process (so the load generator doesn't share its GIL)."""
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=BACKEND_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"API server exited with code {proc.returncode}")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/health/ready")
+            if conn.getresponse().status == 200:
+                return proc
+        except OSError:
+            pass
+        time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("API server did not become ready")
+
+
+def _multipart(data: bytes, filename: str = "bench.jpg", content_type: str = "image/jpeg"):
+    boundary = "morphbench" + os.urandom(8).hex()
+    head = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{filename}\"\r\n"
+            f"Content-Type: {content_type}\r\n\r\n").encode()
+    return head, f"\r\n--{boundary}--\r\n".encode(), f"multipart/form-data; boundary={boundary}"
+
+
+def bench_load(host: str, port: int, data: bytes, concurrency: int, requests: int,
+               unique: bool = True) -> Dict[str, Any]:
+    """
+    `requests` POST /analyze calls from `concurrency` keep-alive clients. With `unique`, every upload
+    gets distinct trailing bytes (ignored by decoders) so the result cache can't answer it.
+    """
+    head, tail, content_type = _multipart(data)
+    counter = iter(range(requests))
+    lock = threading.Lock()
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+
+    def client():
+        conn = http.client.HTTPConnection(host, port, timeout=120)
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                break
+            body = head + data + (i.to_bytes(8, "little") if unique else b"") + tail
+            start = time.perf_counter()
+            try:
+                conn.request("POST", "/analyze", body=body, headers={"Content-Type": content_type})
+                response = conn.getresponse()
+                response.read()
+                status = str(response.status)
+            except OSError as e:
+                conn.close()
+                conn = http.client.HTTPConnection(host, port, timeout=120)
+                status = type(e).__name__
+            elapsed = time.perf_counter() - start
+            with lock:
+                statuses[status] = statuses.get(status, 0) + 1
+                if status == "200":
+                    latencies.append(elapsed)
+        conn.close()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        for _ in range(concurrency):
+            executor.submit(client)
+    wall = time.perf_counter() - start
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "uniqueUploads": unique,
+        "uploadBytes": len(data),
+        "wallSeconds": round(wall, 3),
+        "throughput": round(statuses.get("200", 0) / wall, 2) if wall else None,
+        "statuses": statuses,
+        "latency": summarize(latencies),
+    }
+
+
+# --- CLI -----------------------------------------------------------------------------------------
+
+def _ints(text: str) -> List[int]:
+    return [int(x) for x in text.split(",") if x]
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark the morphology analysis pipeline.")
+    parser.add_argument("--suites", default="stages,metrics,load", help="comma-separated: stages,metrics,load")
+    parser.add_argument("--out", help="JSON output path (default: stdout)")
+    parser.add_argument("--sizes", type=_ints, default=[1, 12, 48], help="megapixels: any of 1,12,48")
+    parser.add_argument("--formats", default="jpeg,png,webp", help="comma-separated: jpeg,png,webp")
+    parser.add_argument("--orientations", type=_ints, default=[1, 6], help="EXIF orientations: any of 1,3,6,8")
+    parser.add_argument("--repeat", type=int, default=10, help="timed runs per stage case")
+    parser.add_argument("--warmup", type=int, default=2, help="untimed runs per stage case")
+    parser.add_argument("--store", help="LandmarkStore directory for the metrics suite (default: synthetic)")
+    parser.add_argument("--faces", type=int, default=100000, help="synthetic faces for the metrics suite")
+    parser.add_argument("--url", help="benchmark a running server, e.g. http://127.0.0.1:8000 (default: start one)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--load-size", type=int, default=12, help="megapixels of the /analyze upload")
+    parser.add_argument("--cached", action="store_true", help="repeat identical uploads (measures cache hits)")
+    args = parser.parse_args(argv)
+    suites = set(args.suites.split(","))
+
+    result: Dict[str, Any] = {"run": run_info()}
+    if "stages" in suites:
+        result["stages"] = bench_stages(args.sizes, args.formats.split(","), args.orientations,
+                                        args.repeat, args.warmup)
+    if "metrics" in suites:
+        if args.store:
+            from engine.landmark_store import LandmarkStore
+            landmarks, sizes = LandmarkStore(args.store, readonly=True).arrays()
+            landmarks, sizes = np.asarray(landmarks), np.asarray(sizes)
+        else:
+            landmarks, sizes = synthetic_landmarks(args.faces)
+        result["metrics"] = bench_metrics(landmarks, sizes)
+        result["metrics"]["source"] = args.store or "synthetic"
+    if "load" in suites:
+        data = encode_image(synthetic_face(*SIZES[args.load_size]), "JPEG", 6, quality=90)
+        server = None
+        if args.url:
+            host, _, port = args.url.split("://", 1)[-1].rstrip("/").partition(":")
+            port = int(port or 80)
+        else:
+            host, port = "127.0.0.1", _free_port()
+            server = start_server(port)
+        try:
+            result["load"] = bench_load(host, port, data, args.concurrency, args.requests, unique=not args.cached)
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+
+    text = json.dumps(result, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Multi-shot aggregation: one stable set of scores for a subject photographed several times.
+
+Single-photo scores move with small changes in pose and expression. Here every shot's mesh is
+aligned to a common consensus shape (generalized Procrustes: translation, scale and in-plane
+rotation removed, eyes level), shots whose aligned shape sits unusually far from the consensus are
+rejected as outliers (a turned head, a grimace, a bad detection), and each measurement is reported
+as the median over the remaining shots with a bootstrap confidence interval. Only NumPy is required.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from engine.metrics import build_reports, compute_metrics, to_pixels
+from engine.population import TRAITS
+from engine.profiles import PROFILES, summarize
+
+# Shots whose Procrustes residual has a robust z-score (median / MAD) above this are rejected.
+OUTLIER_Z = 3.5
+# Shots needed before any can be rejected: with fewer, "unusual" has no meaning.
+MIN_SHOTS_FOR_OUTLIERS = 3
+BOOTSTRAP_SAMPLES = 2000
+CONFIDENCE = 0.95
+
+_EYE_LEFT_OUTER, _EYE_RIGHT_OUTER = 33, 263
+
+
+def _normalize(points: np.ndarray) -> np.ndarray:
+    """Centres each (K, 2) shape of a stack and scales it to unit Frobenius norm."""
+    points = points - points.mean(axis=-2, keepdims=True)
+    norm = np.linalg.norm(points, axis=(-2, -1), keepdims=True)
+    return points / np.where(norm > 0, norm, 1)
+
+
+def _rotate_onto(shapes: np.ndarray, reference: np.ndarray) -> np.ndarray:
+    """Rotates each normalized (K, 2) shape of a stack onto `reference` (least squares, no reflection)."""
+    # 2D Kabsch: the optimal angle comes straight from the cross-covariance terms.
+    cross = np.einsum("nki,kj->nij", shapes, reference)
+    angle = np.arctan2(cross[:, 0, 1] - cross[:, 1, 0], cross[:, 0, 0] + cross[:, 1, 1])
+    cos, sin = np.cos(angle), np.sin(angle)
+    rotation = np.stack([np.stack([cos, sin], axis=-1), np.stack([-sin, cos], axis=-1)], axis=-2)
+    return np.einsum("nki,nij->nkj", shapes, rotation)
+
+
+def procrustes_align(points: np.ndarray, iterations: int = 10, tol: float = 1e-8) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Generalized Procrustes alignment of a stack of (N, K, 2) shapes. Returns the aligned unit-size
+    shapes, their consensus (mean) shape with the eye line horizontal, and each shape's residual
+    (Procrustes distance to the consensus).
+    """
+    shapes = _normalize(np.asarray(points, dtype=np.float64))
+    reference = shapes[0]
+    for _ in range(iterations):
+        shapes = _rotate_onto(shapes, reference)
+        mean = _normalize(shapes.mean(axis=0))
+        converged = np.linalg.norm(mean - reference) < tol
+        reference = mean
+        if converged:
+            break
+
+    eye_line = reference[_EYE_RIGHT_OUTER] - reference[_EYE_LEFT_OUTER]
+    level = reference @ _rotation(-np.arctan2(eye_line[1], eye_line[0]))
+    shapes = _rotate_onto(shapes, level)
+    residuals = np.linalg.norm(shapes - level, axis=(1, 2))
+    return shapes, level, residuals
+
+
+def _rotation(angle: float) -> np.ndarray:
+    """Row-vector rotation matrix: points @ _rotation(a) turns points by `a` radians."""
+    c, s = np.cos(angle), np.sin(angle)
+    return np.array([[c, s], [-s, c]])
+
+
+def outliers(residuals: np.ndarray, threshold: float = OUTLIER_Z) -> np.ndarray:
+    """Mask of shots whose residual is an upper outlier by modified z-score (0.6745 (r - median) / MAD)."""
+    rejected = np.zeros(len(residuals), dtype=bool)
+    if len(residuals) < MIN_SHOTS_FOR_OUTLIERS:
+        return rejected
+    median = np.median(residuals)
+    mad = np.median(np.abs(residuals - median))
+    if mad == 0:
+        return rejected
+    return 0.6745 * (residuals - median) / mad > threshold
+
+
+def bootstrap_median(values: np.ndarray, samples: int = BOOTSTRAP_SAMPLES, confidence: float = CONFIDENCE,
+                     seed: int = 0) -> Tuple[float, float]:
+    """Percentile-bootstrap confidence interval of the median of `values`, resampled in one vectorized pass."""
+    if len(values) == 1:
+        return float(values[0]), float(values[0])
+    rng = np.random.default_rng(seed)
+    medians = np.median(values[rng.integers(0, len(values), (samples, len(values)))], axis=1)
+    tail = (1 - confidence) / 2 * 100
+    low, high = np.percentile(medians, [tail, 100 - tail])
+    return float(low), float(high)
+
+
+def aggregate_shots(landmarks: np.ndarray, sizes, profiles: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Scores a subject from a stack of (N, 478, 3) meshes of the same face with their image sizes.
+
+    Returns {"analysis": a report shaped like /analyze (each field the median over accepted shots,
+    without landmarks), "confidence": {trait: {"value", "low", "high", "std"}}, "shots": [{"index",
+    "accepted", "residual", "harmonyScore"}], "accepted": count}, plus "profiles" (engine.profiles
+    scores of the median measurements) when `profiles` names any.
+    """
+    p, _ = to_pixels(landmarks, sizes)
+    aligned, _, residuals = procrustes_align(p)
+    rejected = outliers(residuals)
+    accepted = ~rejected
+
+    # Scored on the aligned shapes (size 1 x 1: the kernel only reads ratios and angles), so in-plane
+    # roll no longer leaks into the tilt and symmetry measurements.
+    m = compute_metrics(aligned, (1, 1))
+    kept = {column: values[accepted] for column, values in m.items()}
+    median = {column: np.nanmedian(values, keepdims=True) for column, values in kept.items()}
+    report = build_reports(median)[0]
+
+    confidence = {}
+    for trait, column in TRAITS.items():
+        values = kept[column][np.isfinite(kept[column])]
+        if not len(values):
+            continue
+        low, high = bootstrap_median(values)
+        confidence[trait] = {"value": round(float(np.median(values)), 4), "low": round(low, 4), "high": round(high, 4),
+                             "std": round(float(values.std(ddof=1)), 4) if len(values) > 1 else 0.0}
+
+    shots = [{"index": i, "accepted": bool(accepted[i]), "residual": round(float(residuals[i]), 5),
+              "harmonyScore": round(float(m["overall_score"][i]), 1)} for i in range(len(residuals))]
+    out = {"analysis": report, "confidence": confidence, "shots": shots, "accepted": int(accepted.sum())}
+    if profiles:
+        out["profiles"] = summarize(PROFILES.select(profiles).evaluate(median))
+    return out
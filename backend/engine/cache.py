@@ -0,0 +1,127 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ResultCache:
+    """
+    Content-addressed cache of analysis results.
+
+    Keys are the SHA-256 of the uploaded bytes, scoped by the engine version so a scoring change
+    never serves stale numbers. The memory tier is an LRU bounded by entry count and TTL; the
+    optional disk tier (one JSON file per key under `directory`) survives restarts.
+    """
+
+    def __init__(self, version: str, max_entries: int = 1024, ttl: float = 3600,
+                 directory: Optional[str] = None):
+        self.version = version
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.directory = os.path.join(directory, version) if directory else None
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(image_bytes) -> str:
+        return hashlib.sha256(image_bytes).hexdigest()
+
+    @staticmethod
+    def hasher():
+        """Incremental form of key(): feed chunks with update(), then take hexdigest()."""
+        return hashlib.sha256()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+
+        value = self._read_disk(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+        self._remember(key, value)
+        return value
+
+    def put(self, key: str, value: Dict[str, Any]):
+        self._remember(key, value)
+        self._write_disk(key, value)
+
+    def _remember(self, key: str, value: Dict[str, Any]):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def _read_disk(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.directory:
+            return None
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                os.remove(path)
+                return None
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_disk(self, key: str, value: Dict[str, Any]):
+        if not self.directory:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write-then-rename so a concurrent reader never sees a half-written file.
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(value, f)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning("Cache write failed: %s", e)
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "version": self.version,
+                "entries": len(self._entries),
+                "maxEntries": self.max_entries,
+                "ttlSeconds": self.ttl,
+                "diskTier": bool(self.directory),
+                "hits": self.hits,
+                "diskHits": self.disk_hits,
+                "misses": self.misses,
+                "hitRate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,157 @@
+import io
+import logging
+import mmap
+import os
+from typing import Dict, Optional, Tuple, Union
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from engine.telemetry import stage
+
+logger = logging.getLogger(__name__)
+
+# Long edge (pixels) images are reduced to before preprocessing and inference; 0 keeps full resolution.
+# MediaPipe runs its detector at 128px and the mesh at 256px on the face crop, so ~1K leaves ample headroom.
+DEFAULT_MAX_SIDE = int(os.environ.get("MORPH_MAX_SIDE", 1024))
+
+# EXIF orientation -> transpose that restores the upright image (same table as ImageOps.exif_transpose).
+_EXIF_TRANSPOSE = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+
+
+# Anything decode_image reads from: an upload's bytes, a memoryview (in-memory upload, or shared memory
+# in process mode) or an mmap of a spooled upload.
+Buffer = Union[bytes, bytearray, memoryview, mmap.mmap]
+
+
+class DecodeError(ValueError):
+    """The bytes passed the upload's type check but could not be decoded as an image (e.g. truncated)."""
+
+
+class BufferReader(io.RawIOBase):
+    """
+    Read-only file object over a buffer (memoryview, bytearray, shared memory) that never copies the
+    whole thing: each read() copies only the requested slice, so PIL can stream-decode from it.
+    """
+
+    def __init__(self, buffer):
+        self._view = memoryview(buffer).cast("B")
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: len(self._view)}[whence]
+        self._pos = max(0, base + offset)
+        return self._pos
+
+    def read(self, size: int = -1) -> bytes:
+        end = len(self._view) if size is None or size < 0 else min(len(self._view), self._pos + size)
+        data = self._view[self._pos:end].tobytes()
+        self._pos = max(self._pos, end)
+        return data
+
+    def readinto(self, b) -> int:
+        n = max(0, min(len(b), len(self._view) - self._pos))
+        memoryview(b).cast("B")[:n] = self._view[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+    def close(self):
+        self._view.release()
+        super().close()
+
+
+def _open_buffer(data: Buffer):
+    """File object for decoders: bytes are wrapped without copying, mmaps are files already."""
+    if isinstance(data, bytes):
+        return io.BytesIO(data)  # shares the bytes object until written to
+    if isinstance(data, mmap.mmap):
+        data.seek(0)
+        return data
+    return BufferReader(data)
+
+
+def _target_size(w: int, h: int, max_side: int) -> Tuple[int, int]:
+    if not max_side or max(w, h) <= max_side:
+        return w, h
+    scale = max_side / max(w, h)
+    return max(1, round(w * scale)), max(1, round(h * scale))
+
+
+def _resize(image: np.ndarray, size: Tuple[int, int]) -> np.ndarray:
+    h, w = image.shape[:2]
+    if (w, h) == tuple(size):
+        return image
+    # After draft decoding the remaining factor is below 2x, where bilinear does not alias and is
+    # several times cheaper than area averaging; larger reductions (PNG etc.) need INTER_AREA.
+    interpolation = cv2.INTER_LINEAR if w < 2 * size[0] else cv2.INTER_AREA
+    return cv2.resize(image, size, interpolation=interpolation)
+
+
+def decode_image(image_bytes: Buffer, max_side: int = DEFAULT_MAX_SIDE,
+                 timings: Optional[Dict[str, float]] = None) -> Tuple[np.ndarray, Tuple[int, int]]:
+    """
+    Decodes an upload into an upright RGB array whose long edge is at most `max_side`.
+
+    JPEGs are decoded in draft mode (DCT scaling), so a 48 MP photo is never materialized at full
+    resolution; the remaining reduction and the EXIF rotation run on the small image. Returns the
+    array and the upright size (w, h) of the original image, so normalized landmarks can still be
+    mapped back to original-pixel coordinates. When `timings` is given, the "decode" and "exif"
+    stage durations (seconds) are added to it.
+
+    The input is read in place (see Buffer): neither path copies the whole encoded image.
+    """
+    try:
+        with stage(timings, "decode"):
+            pil_image = Image.open(_open_buffer(image_bytes))
+            orientation = pil_image.getexif().get(0x0112, 1)
+            full_w, full_h = pil_image.size
+            target = _target_size(full_w, full_h, max_side)
+
+            if pil_image.format == 'JPEG' and target != (full_w, full_h):
+                pil_image.draft('RGB', target)
+            if pil_image.mode != 'RGB':
+                pil_image = pil_image.convert('RGB')
+            else:
+                pil_image.load()
+
+        with stage(timings, "exif"):
+            method = _EXIF_TRANSPOSE.get(orientation)
+            if method is not None:
+                pil_image = pil_image.transpose(method)
+                if orientation >= 5:
+                    full_w, full_h = full_h, full_w
+                    target = target[::-1]
+
+        with stage(timings, "decode"):
+            return _resize(np.asarray(pil_image), target), (full_w, full_h)
+
+    except Exception as e:
+        # Fallback for formats PIL cannot open
+        logger.warning("PIL load failed (%s), falling back to cv2 raw decode", e)
+        with stage(timings, "decode"):
+            nparr = np.frombuffer(image_bytes, np.uint8)
+            image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+            if image is None:
+                raise DecodeError("Could not decode image")
+
+            full_h, full_w = image.shape[:2]
+            image = _resize(image, _target_size(full_w, full_h, max_side))
+            return cv2.cvtColor(image, cv2.COLOR_BGR2RGB), (full_w, full_h)
@@ -0,0 +1,124 @@
+import os
+from typing import Any, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from engine.decode import decode_image
+from engine.metrics import build_reports, compute_metrics
+from engine.payload import mesh_to_text
+from engine.quality import GATE_MODE, check_face, enforce, measure_image, public
+from engine.telemetry import stage
+
+# Upper bound for ?max_faces= on /analyze/faces (MediaPipe's num_faces for the multi-face landmarker).
+MAX_FACES = int(os.environ.get("MORPH_MAX_FACES", 10))
+# Faces whose box is shorter than this (working-image pixels) are re-run on an upscaled crop: the
+# detector sees the whole frame at 128px, so small faces get loose boxes and coarse meshes.
+SMALL_FACE_SIDE = 160
+# Crop side, in pixels, small faces are upscaled to before the second pass (mesh model input is 256).
+REFINE_SIDE = 384
+# Crop side relative to the face box, so the detector sees the whole head with some context.
+REFINE_MARGIN = 2.0
+
+
+def face_boxes(meshes: np.ndarray) -> np.ndarray:
+    """(N, 4) normalized (x, y, w, h) boxes around stacked (N, 478, 3) meshes, clipped to the image."""
+    lo = np.clip(meshes[..., :2].min(axis=1), 0.0, 1.0)
+    hi = np.clip(meshes[..., :2].max(axis=1), 0.0, 1.0)
+    return np.concatenate([lo, hi - lo], axis=1)
+
+
+def _refine(engine, source: np.ndarray, box: np.ndarray) -> Optional[np.ndarray]:
+    """
+    Re-runs the single-face landmarker on an upscaled square crop around `box` (normalized) of the
+    upright RGB `source`. Returns the new mesh in whole-image normalized coordinates, or None.
+    """
+    H, W = source.shape[:2]
+    x, y, w, h = box
+    side = REFINE_MARGIN * max(w * W, h * H)
+    x0 = int(max(0, (x + w / 2) * W - side / 2))
+    y0 = int(max(0, (y + h / 2) * H - side / 2))
+    x1 = int(min(W, x0 + side))
+    y1 = int(min(H, y0 + side))
+    crop = source[y0:y1, x0:x1]
+    if crop.size == 0:
+        return None
+    cw, ch = x1 - x0, y1 - y0
+    scale = REFINE_SIDE / max(cw, ch)
+    if scale > 1:
+        crop = cv2.resize(crop, (max(1, round(cw * scale)), max(1, round(ch * scale))), interpolation=cv2.INTER_CUBIC)
+
+    result = engine.detect(np.ascontiguousarray(crop))
+    if not result.face_landmarks:
+        return None
+    mesh = np.array([(lm.x, lm.y, lm.z) for lm in result.face_landmarks[0]], dtype=np.float32)
+    mesh[:, 0] = (x0 + mesh[:, 0] * cw) / W
+    mesh[:, 1] = (y0 + mesh[:, 1] * ch) / H
+    mesh[:, 2] *= cw / W  # MediaPipe scales z like x
+    # The crop may also hold a neighbour's face; only accept the one centred inside the original box.
+    cx, cy = mesh[:, :2].mean(axis=0)
+    if not (x <= cx <= x + w and y <= cy <= y + h):
+        return None
+    return mesh
+
+
+def analyze_faces(engine, image_bytes, max_faces: int = MAX_FACES, refine: bool = True,
+                  gate: str = GATE_MODE) -> Optional[Dict[str, Any]]:
+    """
+    Scores every face in an image (up to `max_faces`) from one landmarker pass.
+
+    All meshes are scored together by the vectorized metrics kernel. With `refine`, faces smaller than
+    SMALL_FACE_SIDE are re-detected on an upscaled crop; the crop comes from a full-resolution decode
+    when the working image was downscaled, so only small faces pay for the extra pixels.
+    The whole image goes through the quality gate like /analyze uploads; face checks (size, pose) are
+    only reported per face, since one bad face should not fail the group.
+    Returns {"size", "faces": [{"index", "box", "refined", "analysis", "mesh"}], "timings"} with faces
+    ordered left to right (meshes as base64 float32, see engine.payload), or None when no face is found.
+    """
+    timings = {}
+    image, size = decode_image(image_bytes, engine.max_side, timings)
+    quality = None
+    if gate != "off":
+        with stage(timings, "quality"):
+            quality = measure_image(image, size)
+        enforce(quality, gate)
+    result = engine.detect(image, timings, max_faces=max_faces, stats=quality["luma"] if quality else None)
+    if not result.face_landmarks:
+        return None
+
+    meshes = np.stack([np.array([(lm.x, lm.y, lm.z) for lm in face], dtype=np.float32)
+                       for face in result.face_landmarks[:max_faces]])
+    boxes = face_boxes(meshes)
+    refined = np.zeros(len(meshes), dtype=bool)
+
+    if refine:
+        h, w = image.shape[:2]
+        small = np.flatnonzero(np.minimum(boxes[:, 2] * w, boxes[:, 3] * h) < SMALL_FACE_SIDE)
+        if len(small):
+            source = image if size == (w, h) else decode_image(image_bytes, 0)[0]
+            for i in small:
+                mesh = _refine(engine, source, boxes[i])
+                if mesh is not None:
+                    meshes[i], refined[i] = mesh, True
+            boxes = face_boxes(meshes)
+
+    with stage(timings, "metrics"):
+        m = compute_metrics(meshes, size)
+    with stage(timings, "serialize"):
+        reports = build_reports(m)
+
+    faces: List[Dict[str, Any]] = []
+    for i in np.argsort(boxes[:, 0], kind="stable"):
+        if quality is not None:
+            face_quality = {k: v for k, v in quality.items() if k != "issues"}
+            face_quality["issues"] = list(quality["issues"])
+            check_face(face_quality, None, meshes[i], size)
+            reports[i]["quality"] = public(face_quality)
+        faces.append({
+            "index": len(faces),
+            "box": dict(zip(("x", "y", "w", "h"), np.round(boxes[i], 5).tolist())),
+            "refined": bool(refined[i]),
+            "analysis": reports[i],
+            "mesh": mesh_to_text(meshes[i]),  # rendered into analysis.landmarks by the API
+        })
+    return {"size": list(size), "faces": faces, "timings": timings}
@@ -0,0 +1,280 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+TERMINAL = ("done", "failed")
+
+
+class JobStore:
+    """
+    Durable queue of analysis jobs: an SQLite database plus one input file per distinct upload,
+    both under `directory`.
+
+    A job's id is derived from its kind, the SHA-256 of its input, its parameters and the engine
+    version, so submitting the same work twice returns the existing job instead of queuing another.
+    Jobs left "running" by a previous process are queued again on open. Results are stored as JSON;
+    inputs are deleted once no unfinished job needs them, and finished jobs expire after `ttl` seconds.
+    """
+
+    def __init__(self, directory: str, version: str, ttl: float = 7 * 86400):
+        self.directory = directory
+        self.version = version
+        self.ttl = ttl
+        self._inputs = os.path.join(directory, "inputs")
+        os.makedirs(self._inputs, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(directory, "jobs.sqlite3"), check_same_thread=False,
+                                   isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    digest TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    filename TEXT,
+                    status TEXT NOT NULL,
+                    priority INTEGER NOT NULL,
+                    created REAL NOT NULL,
+                    updated REAL NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    result TEXT,
+                    error TEXT
+                )""")
+            self._db.execute("CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority, created)")
+            self._db.execute("UPDATE jobs SET status = 'queued' WHERE status = 'running'")
+        self.purge()
+
+    def job_id(self, kind: str, digest: str, params: Dict[str, Any]) -> str:
+        spec = json.dumps([kind, digest, params, self.version], sort_keys=True)
+        return hashlib.sha256(spec.encode()).hexdigest()[:32]
+
+    def input_path(self, digest: str) -> str:
+        return os.path.join(self._inputs, digest)
+
+    def save_input(self, digest: str, data) -> str:
+        """Stores an upload under its hash (once) and returns the path."""
+        path = self.input_path(digest)
+        if not os.path.exists(path):
+            fd, tmp = tempfile.mkstemp(dir=self._inputs, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        return path
+
+    def save_input_file(self, fileobj, chunk: int = 1 << 20) -> str:
+        """Copies a file-like upload into the store while hashing it; returns its SHA-256."""
+        hasher = hashlib.sha256()
+        fd, tmp = tempfile.mkstemp(dir=self._inputs, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                while block := fileobj.read(chunk):
+                    hasher.update(block)
+                    f.write(block)
+            digest = hasher.hexdigest()
+            os.replace(tmp, self.input_path(digest))
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+        return digest
+
+    def submit(self, kind: str, digest: str, params: Dict[str, Any], filename: str = "",
+               priority: int = 10, data=None) -> Tuple[Dict[str, Any], bool]:
+        """
+        Queues a job for an input given as `data` (stored only if the job is queued) or stored earlier
+        with save_input_file(). Returns (job, created); an existing job for the same work is returned
+        as is, unless it failed with a server error (>= 500), in which case it is queued again.
+        Input-related failures (no face, rejected) are final.
+        """
+        job_id = self.job_id(kind, digest, params)
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT status, error FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            created = row is None
+            retry = not created and row["status"] == "failed" and json.loads(row["error"] or "{}").get("status", 500) >= 500
+            # The input is written before the job is visible to claim(), and only when it will run.
+            if (created or retry) and data is not None:
+                self.save_input(digest, data)
+            if created:
+                self._db.execute(
+                    "INSERT INTO jobs (id, kind, digest, params, filename, status, priority, created, updated)"
+                    " VALUES (?, ?, ?, ?, ?, 'queued', ?, ?, ?)",
+                    (job_id, kind, digest, json.dumps(params), filename, priority, now, now))
+            elif retry:
+                self._db.execute("UPDATE jobs SET status = 'queued', result = NULL, error = NULL, updated = ?"
+                                 " WHERE id = ?", (now, job_id))
+        if not (created or retry):
+            # A finished job was resubmitted: drop an input stored for it ahead of time (save_input_file).
+            self._release_input(digest)
+        return self.get(job_id), created
+
+    def claim(self, limit: int) -> List[Dict[str, Any]]:
+        """Marks up to `limit` queued jobs as running (highest priority, then oldest first) and returns them."""
+        if limit <= 0:
+            return []
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._db.execute("SELECT * FROM jobs WHERE status = 'queued' ORDER BY priority, created"
+                                        " LIMIT ?", (limit,)).fetchall()
+                now = time.time()
+                self._db.executemany("UPDATE jobs SET status = 'running', attempts = attempts + 1, updated = ?"
+                                     " WHERE id = ?", [(now, r["id"]) for r in rows])
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return [dict(self._public(r), status="running") for r in rows]
+
+    def finish(self, job_id: str, result: Dict[str, Any]):
+        self._close(job_id, "done", json.dumps(result), None)
+
+    def fail(self, job_id: str, status_code: int, error: Any):
+        self._close(job_id, "failed", None, json.dumps({"status": status_code, "detail": error}))
+
+    def _close(self, job_id: str, status: str, result: Optional[str], error: Optional[str]):
+        with self._lock:
+            self._db.execute("UPDATE jobs SET status = ?, result = ?, error = ?, updated = ? WHERE id = ?",
+                             (status, result, error, time.time(), job_id))
+            row = self._db.execute("SELECT digest FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is not None:
+            self._release_input(row["digest"])
+
+    def _release_input(self, digest: str):
+        with self._lock:
+            pending = self._db.execute("SELECT 1 FROM jobs WHERE digest = ? AND status IN ('queued', 'running')"
+                                       " LIMIT 1", (digest,)).fetchone()
+        if pending is None:
+            try:
+                os.remove(self.input_path(digest))
+            except OSError:
+                pass
+
+    @staticmethod
+    def _public(row: sqlite3.Row) -> Dict[str, Any]:
+        job = {k: row[k] for k in ("id", "kind", "digest", "filename", "status", "priority", "created",
+                                   "updated", "attempts")}
+        job["params"] = json.loads(row["params"])
+        if row["error"]:
+            job["error"] = json.loads(row["error"])
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """The job's state, without its result."""
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._public(row) if row is not None else None
+
+    def get_many(self, job_ids: List[str]) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._db.execute(f"SELECT * FROM jobs WHERE id IN ({','.join('?' * len(job_ids))})",
+                                    job_ids).fetchall()
+        return [self._public(r) for r in rows]
+
+    def result(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute("SELECT result FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row["result"]) if row is not None and row["result"] else None
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._db.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {r["status"]: r["n"] for r in rows}
+
+    def purge(self, min_age: float = 0.0):
+        """
+        Deletes finished jobs older than the TTL and input files no queued job refers to. With
+        `min_age`, files modified more recently are kept: they may belong to a submission in progress.
+        """
+        started = time.time()
+        with self._lock:
+            self._db.execute("DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated < ?",
+                             (time.time() - self.ttl,))
+            needed = {r["digest"] for r in self._db.execute(
+                "SELECT DISTINCT digest FROM jobs WHERE status IN ('queued', 'running')")}
+        for name in os.listdir(self._inputs):
+            if name not in needed:
+                path = os.path.join(self._inputs, name)
+                try:
+                    if started - os.path.getmtime(path) >= min_age:
+                        os.remove(path)
+                except OSError:
+                    pass
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class JobRunner:
+    """
+    Drains a JobStore on the event loop. `capacity()` is how many jobs may run at once (the engine
+    pool's size, so every worker has bulk work while interactive calls still overtake it in the pool's
+    priority queue); `execute(job)` runs one job and records its outcome in the store. Expired jobs
+    and orphaned inputs are purged every `purge_interval` seconds.
+    """
+
+    def __init__(self, store: JobStore, execute: Callable[[Dict[str, Any]], Awaitable[None]],
+                 capacity: Callable[[], int], idle_poll: float = 1.0, purge_interval: float = 3600.0):
+        self.store = store
+        self.execute = execute
+        self.capacity = capacity
+        self.idle_poll = idle_poll
+        self.purge_interval = purge_interval
+        self._wakeup = asyncio.Event()
+        self._running: set = set()
+
+    def notify(self):
+        """Wakes the runner after a submission."""
+        self._wakeup.set()
+
+    @property
+    def running(self) -> int:
+        return len(self._running)
+
+    async def _run(self, job: Dict[str, Any]):
+        try:
+            await self.execute(job)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.exception("Job %s failed: %s", job["id"], e)
+            await asyncio.to_thread(self.store.fail, job["id"], 500, str(e))
+
+    async def run(self):
+        purged = time.monotonic()
+        try:
+            while True:
+                if time.monotonic() - purged >= self.purge_interval:
+                    purged = time.monotonic()
+                    await asyncio.to_thread(self.store.purge, self.purge_interval)
+                free = self.capacity() - len(self._running)
+                jobs = await asyncio.to_thread(self.store.claim, free) if free > 0 else []
+                for job in jobs:
+                    self._running.add(asyncio.ensure_future(self._run(job)))
+                if jobs and len(self._running) < self.capacity():
+                    continue  # more may be queued
+                self._wakeup.clear()
+                waiters = set(self._running) | {asyncio.ensure_future(self._wakeup.wait())}
+                done, _ = await asyncio.wait(waiters, timeout=self.idle_poll, return_when=asyncio.FIRST_COMPLETED)
+                self._running -= done
+                for w in waiters - self._running - done:
+                    w.cancel()
+        finally:
+            # Interrupted jobs stay "running" in the store and are queued again on the next start.
+            for task in self._running:
+                task.cancel()
@@ -0,0 +1,115 @@
+import os
+import threading
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+NUM_LANDMARKS = 478
+_RECORD = (NUM_LANDMARKS, 3)
+
+
+class LandmarkStore:
+    """
+    Append-only archive of raw face meshes, indexed by image hash.
+
+    Columnar layout under `directory`:
+      landmarks.f32  float32 records of (478, 3) normalized landmarks
+      sizes.i32      int32 (w, h) of the original upright image, one pair per record
+      keys.txt       image hash per record, one per line (row order)
+    The binary files are plain arrays, so readers memory-map them and re-score without MediaPipe.
+    There must be a single writer process per directory; readers may run concurrently.
+    """
+
+    def __init__(self, directory: str, readonly: bool = False):
+        self.directory = directory
+        self.readonly = readonly
+        if not readonly:
+            os.makedirs(directory, exist_ok=True)
+        self._landmarks_path = os.path.join(directory, "landmarks.f32")
+        self._sizes_path = os.path.join(directory, "sizes.i32")
+        self._keys_path = os.path.join(directory, "keys.txt")
+        self._lock = threading.Lock()
+        self._index: Dict[str, int] = {}
+        self._keys: List[str] = []
+        self._load_index()
+
+    def _load_index(self):
+        keys = []
+        if os.path.exists(self._keys_path):
+            with open(self._keys_path) as f:
+                keys = [line.strip() for line in f if line.strip()]
+
+        # A crash mid-append (or, for readers, an append in progress) can leave the three files at
+        # different lengths; only the common prefix is valid. The writer trims the rest.
+        landmark_rows = self._file_rows(self._landmarks_path, np.float32, _RECORD)
+        size_rows = self._file_rows(self._sizes_path, np.int32, (2,))
+        rows = min(len(keys), landmark_rows, size_rows)
+        if not rows == len(keys) == landmark_rows == size_rows and not self.readonly:
+            self._truncate(rows, keys)
+        self._keys = keys[:rows]
+        self._index = {k: i for i, k in enumerate(self._keys)}
+
+    @staticmethod
+    def _file_rows(path: str, dtype, shape) -> int:
+        if not os.path.exists(path):
+            return 0
+        return os.path.getsize(path) // (np.dtype(dtype).itemsize * int(np.prod(shape)))
+
+    def _truncate(self, rows: int, keys: List[str]):
+        for path, dtype, shape in ((self._landmarks_path, np.float32, _RECORD), (self._sizes_path, np.int32, (2,))):
+            if os.path.exists(path):
+                with open(path, "r+b") as f:
+                    f.truncate(rows * np.dtype(dtype).itemsize * int(np.prod(shape)))
+        with open(self._keys_path, "w") as f:
+            f.writelines(k + "\n" for k in keys[:rows])
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._index
+
+    @property
+    def keys(self) -> List[str]:
+        return list(self._keys)
+
+    def add(self, key: str, landmarks: np.ndarray, size: Tuple[int, int]) -> bool:
+        """Appends one face mesh. Returns False if this image hash is already stored."""
+        if self.readonly:
+            raise PermissionError("LandmarkStore opened read-only")
+        record = np.ascontiguousarray(landmarks, dtype=np.float32).reshape(_RECORD)
+        with self._lock:
+            if key in self._index:
+                return False
+            with open(self._landmarks_path, "ab") as f:
+                f.write(record.tobytes())
+            with open(self._sizes_path, "ab") as f:
+                f.write(np.asarray(size, dtype=np.int32).tobytes())
+            # keys.txt is written last: a row only becomes visible once its arrays are complete.
+            with open(self._keys_path, "a") as f:
+                f.write(key + "\n")
+            self._index[key] = len(self._keys)
+            self._keys.append(key)
+        return True
+
+    def arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Memory-maps the archive: (N, 478, 3) float32 landmarks and (N, 2) int32 sizes, read-only."""
+        rows = len(self._keys)
+        if rows == 0:
+            return np.empty((0,) + _RECORD, np.float32), np.empty((0, 2), np.int32)
+        landmarks = np.memmap(self._landmarks_path, dtype=np.float32, mode="r", shape=(rows,) + _RECORD)
+        sizes = np.memmap(self._sizes_path, dtype=np.int32, mode="r", shape=(rows, 2))
+        return landmarks, sizes
+
+    def get(self, key: str) -> Optional[Tuple[np.ndarray, Tuple[int, int]]]:
+        row = self._index.get(key)
+        if row is None:
+            return None
+        landmarks, sizes = self.arrays()
+        return np.array(landmarks[row]), (int(sizes[row][0]), int(sizes[row][1]))
+
+    def iter_chunks(self, chunk: int = 65536) -> Iterator[Tuple[int, np.ndarray, np.ndarray]]:
+        """Yields (start_row, landmarks, sizes) slices of the memory-mapped archive."""
+        landmarks, sizes = self.arrays()
+        for start in range(0, len(landmarks), chunk):
+            yield start, landmarks[start:start + chunk], sizes[start:start + chunk]
@@ -0,0 +1,297 @@
+"""
+Vectorized landmark-to-metrics kernel.
+
+Works on normalized MediaPipe face meshes of shape (478, 3) or stacks of shape (N, 478, 3), so the
+same code scores one live face or re-scores an archive of stored landmarks in a single pass.
+Only NumPy is required; MediaPipe is not imported here.
+"""
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from engine.profiles import HARMONY, PROFILES, summarize
+
+LANDMARKS = {
+    # Vertical Midline
+    "trichion": 10, "glabella": 168, "nasion": 6, "noseTip": 1, "subnasale": 164,
+    "lipTop": 0, "lipUpperBottom": 13, "lipLowerTop": 14, "menton": 152,
+
+    # Brows
+    "browLeftInner": 107, "browLeftOuter": 70,
+    "browRightInner": 336, "browRightOuter": 300,
+
+    # Eyes
+    "eyeLeftInner": 133, "eyeLeftOuter": 33,
+    "eyeLeftTop": 159, "eyeLeftBottom": 145,
+    "eyeLeftTopInner": 160, "eyeLeftTopOuter": 158,
+    "eyeLeftBottomInner": 144, "eyeLeftBottomOuter": 153,
+
+    "eyeRightInner": 362, "eyeRightOuter": 263,
+    "eyeRightTop": 386, "eyeRightBottom": 374,
+    "eyeRightTopInner": 385, "eyeRightTopOuter": 387,
+    "eyeRightBottomInner": 380, "eyeRightBottomOuter": 373,
+
+    # Cheek / Jaw
+    "zygomaLeft": 234, "zygomaRight": 454,
+    "gonionLeft": 58, "gonionRight": 288,
+    "chinLeft": 172, "chinRight": 397,
+
+    # Nose/Mouth
+    "noseAlareLeft": 129, "noseAlareRight": 358,
+    "mouthLeft": 61, "mouthRight": 291,
+    "lipTop": 0, "lipBottom": 17, # Basic height
+    "lipUpperInner": 13, "lipLowerInner": 14, # Inner height
+
+    # Ears (Approx)
+    "earLeft": 234, "earRight": 454
+}
+
+# The engine's own score, compiled once from engine/profiles.json.
+_HARMONY = PROFILES.select([HARMONY])
+
+# Every distance the scoring uses, as landmark-name pairs. Resolved once into index arrays below.
+DISTANCE_PAIRS = {
+    "bizygoma": ("zygomaLeft", "zygomaRight"),
+    "face_h": ("trichion", "menton"),
+    "bigonial": ("gonionLeft", "gonionRight"),
+    "glabella_lip": ("glabella", "lipTop"),
+    "upper_h": ("trichion", "glabella"),
+    "mid_h": ("glabella", "subnasale"),
+    "lower_h": ("subnasale", "menton"),
+    "philtrum_h": ("subnasale", "lipTop"),
+    "chin_h": ("lipBottom", "menton"),
+    "face_w_full": ("earLeft", "earRight"),
+    "eye_l_w": ("eyeLeftInner", "eyeLeftOuter"),
+    "eye_r_w": ("eyeRightInner", "eyeRightOuter"),
+    "intercanthal": ("eyeLeftInner", "eyeRightInner"),
+    "nose_w": ("noseAlareLeft", "noseAlareRight"),
+    "mouth_w": ("mouthLeft", "mouthRight"),
+}
+
+# The kernel only ever reads the named landmarks, so it gathers those ~45 columns first and works on
+# a compact (N, K, 2) array; _COL maps a landmark name to its column in that array.
+_USED = np.array(sorted(set(LANDMARKS.values())))
+_COL = {name: int(np.searchsorted(_USED, idx)) for name, idx in LANDMARKS.items()}
+
+_PAIR_NAMES = list(DISTANCE_PAIRS)
+_PAIR_A = np.array([_COL[a] for a, _ in DISTANCE_PAIRS.values()])
+_PAIR_B = np.array([_COL[b] for _, b in DISTANCE_PAIRS.values()])
+
+_EYE_LEFT_POLY = np.array([_COL[k] for k in ["eyeLeftInner", "eyeLeftTop", "eyeLeftTopOuter", "eyeLeftOuter", "eyeLeftBottomOuter", "eyeLeftBottom"]])
+_EYE_RIGHT_POLY = np.array([_COL[k] for k in ["eyeRightInner", "eyeRightTop", "eyeRightTopOuter", "eyeRightOuter", "eyeRightBottomOuter", "eyeRightBottom"]])
+
+
+def _div(num, den, default):
+    """num / den, with `default` wherever den is not positive."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(den > 0, num / np.where(den > 0, den, 1), default)
+
+
+def _poly_area(pts: np.ndarray) -> np.ndarray:
+    # Shoelace formula over the second-to-last axis: pts (N, K, 2) -> (N,)
+    x, y = pts[..., 0], pts[..., 1]
+    return 0.5 * np.abs(np.sum(x * np.roll(y, 1, axis=-1), axis=-1) - np.sum(y * np.roll(x, 1, axis=-1), axis=-1))
+
+
+def _angle(center: np.ndarray, p1: np.ndarray, p2: np.ndarray) -> np.ndarray:
+    v1 = p1 - center
+    v2 = p2 - center
+    cos = np.sum(v1 * v2, axis=-1) / (np.linalg.norm(v1, axis=-1) * np.linalg.norm(v2, axis=-1))
+    return np.degrees(np.arccos(np.clip(cos, -1.0, 1.0)))
+
+
+def strict_gaussian(x, min_v, max_v, sigma):
+    """Traditional gaussian for strict metrics like symmetry: 100 inside [min_v, max_v], falling off outside."""
+    target = np.clip(x, min_v, max_v)
+    return np.clip(100 * np.exp(-0.5 * ((x - target) / sigma) ** 2), 0, 100)
+
+
+def to_pixels(landmarks: np.ndarray, sizes) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Normalizes input shapes: returns (N, K, 2) float64 pixel coordinates and (N, 2) sizes.
+    `sizes` is one (w, h) for all faces or an (N, 2) array.
+    """
+    lm = np.asarray(landmarks, dtype=np.float64)
+    if lm.ndim == 2:
+        lm = lm[None]
+    sizes = np.broadcast_to(np.asarray(sizes, dtype=np.float64), (lm.shape[0], 2))
+    return lm[..., :2] * sizes[:, None, :], sizes
+
+
+def compute_metrics(landmarks: np.ndarray, sizes) -> Dict[str, np.ndarray]:
+    """
+    Scores one face (478, 3) or a stack (N, 478, 3) of normalized landmarks.
+    Returns a dict of (N,) arrays: raw measurements, sub-scores, bonuses and the overall score.
+    """
+    lm = np.asarray(landmarks)
+    if lm.ndim == 2:
+        lm = lm[None]
+    p, _ = to_pixels(lm[:, _USED], sizes)
+
+    def pt(name):
+        return p[:, _COL[name]]
+
+    dist = np.linalg.norm(p[:, _PAIR_A] - p[:, _PAIR_B], axis=-1)
+    d = {name: dist[:, i] for i, name in enumerate(_PAIR_NAMES)}
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # --- 1. BASIC DIMENSIONS ---
+        bizygoma = d["bizygoma"]
+        face_h = d["face_h"]
+        bigonial = d["bigonial"]
+        phi_ratio = _div(face_h, bizygoma, 1.6)
+        fwhr = _div(bizygoma, d["glabella_lip"], 1.9)
+
+        # --- 2. VERTICAL THIRDS ---
+        tot_h = d["upper_h"] + d["mid_h"] + d["lower_h"]
+        thirds_upper = d["upper_h"] / tot_h * 100
+        thirds_mid = d["mid_h"] / tot_h * 100
+        thirds_lower = d["lower_h"] / tot_h * 100
+        mid_lower_ratio = _div(d["mid_h"], d["lower_h"], 1.0)
+
+        # --- 3. HORIZONTAL RULE OF FIFTHS ---
+        w_face_full = d["face_w_full"]
+        avg_eye_w = (d["eye_l_w"] + d["eye_r_w"]) / 2
+        # ESR: Inter-eye vs Avg Eye Width
+        esr = _div(d["intercanthal"], avg_eye_w, 1.0)
+        expected_face_w = avg_eye_w * 5
+        face_width_deviation = np.abs(w_face_full - expected_face_w) / expected_face_w
+        fifths_score = 100 * np.maximum(0, 1 - (face_width_deviation * 2)) # Strict
+
+        # --- 4. EYES & GAZE ---
+        tilt_l = (pt("eyeLeftInner")[:, 1] - pt("eyeLeftOuter")[:, 1]) / d["eye_l_w"] * 100
+        tilt_r = (pt("eyeRightInner")[:, 1] - pt("eyeRightOuter")[:, 1]) / d["eye_r_w"] * 100
+        avg_eye_tilt = (tilt_l + tilt_r) / 2
+        eye_area_ratio = (_poly_area(p[:, _EYE_LEFT_POLY]) + _poly_area(p[:, _EYE_RIGHT_POLY])) / (face_h * w_face_full) * 100
+
+        # --- 5. GOLDEN RATIOS ---
+        mouth_nose_ratio = _div(d["mouth_w"], d["nose_w"], 1.618)
+
+        # --- 6. SCORING ---
+        # A. SYMMETRY (Very robust to real-world photo conditions)
+        midline_x = (pt("glabella")[:, 0] + pt("menton")[:, 0]) / 2
+
+        def get_sym(kL, kR):
+            asymmetry_pct = (np.abs(np.abs(pt(kL)[:, 0] - midline_x) - np.abs(pt(kR)[:, 0] - midline_x)) / bizygoma) * 100
+            # VERY forgiving: Each 1% asymmetry costs only 5 points, floor at 50
+            return np.clip(100 - (asymmetry_pct * 5), 50, 100)
+
+        sym_eyes = get_sym("eyeLeftOuter", "eyeRightOuter")
+        sym_jaw = get_sym("gonionLeft", "gonionRight")
+        sym_nose = get_sym("noseAlareLeft", "noseAlareRight")
+        s_symmetry = (sym_eyes + sym_jaw + sym_nose) / 3
+
+        # B. PROPORTIONS
+        s_thirds = strict_gaussian(np.abs(thirds_upper - thirds_lower), 0, 15, 12)
+
+        # CHIN-PHILTRUM: traditional (philtrum vs chin) unless extreme, then the lower-third estimate
+        # (typical split: philtrum ~40%, lips ~10%, chin ~50%), clamped to a reasonable range.
+        ratio_traditional = _div(d["chin_h"], d["philtrum_h"], 2.2)
+        ratio_estimate = _div(d["lower_h"] * 0.50, d["lower_h"] * 0.40, 2.2)
+        chin_philtrum_ratio = np.where((ratio_traditional >= 1.5) & (ratio_traditional <= 3.5), ratio_traditional, ratio_estimate)
+        chin_philtrum_ratio = np.clip(chin_philtrum_ratio, 1.5, 3.5)
+
+        jaw_ratio = bigonial / bizygoma
+
+        gonial_angle = (_angle(pt("gonionLeft"), pt("zygomaLeft"), pt("menton")) +
+                        _angle(pt("gonionRight"), pt("zygomaRight"), pt("menton"))) / 2
+
+        m = {
+            "bizygoma": bizygoma, "face_h": face_h, "bigonial": bigonial,
+            "phi_ratio": phi_ratio, "fwhr": fwhr,
+            "thirds_upper": thirds_upper, "thirds_mid": thirds_mid, "thirds_lower": thirds_lower,
+            "mid_lower_ratio": mid_lower_ratio, "esr": esr, "avg_eye_tilt": avg_eye_tilt, "eye_area_ratio": eye_area_ratio,
+            "mouth_nose_ratio": mouth_nose_ratio, "nose_width_ratio": d["nose_w"] / bizygoma,
+            "jaw_ratio": jaw_ratio, "chin_philtrum_ratio": chin_philtrum_ratio, "gonial_angle": gonial_angle,
+            "sym_eyes": sym_eyes, "sym_jaw": sym_jaw, "sym_nose": sym_nose, "s_symmetry": s_symmetry,
+            "s_thirds": s_thirds, "s_fifths_match": fifths_score,
+        }
+
+        # --- 7. SCORING PROFILE ---
+        # Peak-reward curves (jaw, tilt), golden-ratio bands, weights, synergy bonuses and verdicts
+        # are the declarative "harmony" profile (engine/profiles.json); its terms and bonus factors
+        # are kept as columns so the breakdown and reports read them like the measurements.
+        harmony = _HARMONY.evaluate(m, verdicts=False)[HARMONY]
+        m.update(harmony["terms"])
+        m.update(harmony["factors"])
+        m["base_score"] = harmony["base"]
+        m["overall_score"] = harmony["score"]
+    return m
+
+
+# Decimal places each reported measurement is rounded to.
+_REPORT_DIGITS = {
+    "overall_score": 1, "s_symmetry": 1, "phi_ratio": 3, "s_fifths_match": 1,
+    "thirds_upper": 1, "thirds_mid": 1, "thirds_lower": 1, "chin_philtrum_ratio": 2, "fwhr": 2,
+    "avg_eye_tilt": 1, "esr": 3, "eye_area_ratio": 3, "mouth_nose_ratio": 2, "s_mouth_nose": 1,
+    "nose_width_ratio": 3, "sym_nose": 1, "gonial_angle": 1, "jaw_ratio": 2, "sym_jaw": 1,
+}
+
+
+def build_reports(m: Dict[str, np.ndarray]) -> List[Dict[str, Any]]:
+    """Formats every face of `compute_metrics` output as an /analyze response body (without landmarks)."""
+    # Round whole columns at once (NumPy rounding, as the scalar engine did) and convert to Python floats.
+    r = {key: np.round(m[key], digits).tolist() for key, digits in _REPORT_DIGITS.items()}
+    raw = {key: m[key].tolist() for key in ("overall_score", "s_fifths_match", "s_jaw", "s_tilt", "chin_philtrum_ratio", "fwhr", "s_phi")}
+    verdicts = _HARMONY.verdicts(m, m["overall_score"])
+    return [_assemble(r, raw, verdicts, i) for i in range(len(raw["overall_score"]))]
+
+
+def build_report(m: Dict[str, np.ndarray], i: int = 0) -> Dict[str, Any]:
+    """Formats face `i` of `compute_metrics` output as the /analyze response body (without landmarks)."""
+    return build_reports({key: m[key][i:i + 1] for key in m})[0]
+
+
+def _assemble(r: Dict[str, list], raw: Dict[str, list], verdicts: List[str], i: int) -> Dict[str, Any]:
+    s_fifths_match = raw["s_fifths_match"][i]
+    return {
+        "overall": {
+            "harmonyScore": r["overall_score"][i],
+            "symmetryScore": r["s_symmetry"][i],
+            "verdict": verdicts[i]
+        },
+        "proportions": {
+            "phiRatio": r["phi_ratio"][i],
+            "fifthsScore": r["s_fifths_match"][i],
+            "thirds": {"upper": r["thirds_upper"][i], "mid": r["thirds_mid"][i], "lower": r["thirds_lower"][i]},
+            "lowerThirdRatio": r["chin_philtrum_ratio"][i],  # backward compat alias of chinPhiltrumRatio
+            "fWHR": r["fwhr"][i]
+        },
+        "eyes": {
+            "canthalTilt": r["avg_eye_tilt"][i],
+            "eyeSpacingRatio": r["esr"][i],
+            "eyeAreaRatio": r["eye_area_ratio"][i],
+            "harmonyIndex": r["s_fifths_match"][i]
+        },
+        "nose": {
+            "mouthNoseRatio": r["mouth_nose_ratio"][i],
+            "score": r["s_mouth_nose"][i],
+            "noseWidthRatio": r["nose_width_ratio"][i],
+            "symmetry": r["sym_nose"][i]
+        },
+        "jawline": {
+            "gonialAngle": r["gonial_angle"][i],
+            "jawToCheekRatio": r["jaw_ratio"][i],
+            "chinPhiltrumRatio": r["chin_philtrum_ratio"][i],
+            "symmetry": r["sym_jaw"][i],
+            "lowerThirdRatio": r["chin_philtrum_ratio"][i]
+        },
+        "detailed": {
+            "Rule of Fifths Match": f"{s_fifths_match:.1f}%",
+            "Lower Third (1:2)": f"{raw['chin_philtrum_ratio'][i]:.2f}",
+            "Midface Ratio (fWHR)": f"{raw['fwhr'][i]:.2f}",
+            "Golden Ratio Score": f"{raw['s_phi'][i]:.1f}%",
+            "Canthal Tilt Score": f"{raw['s_tilt'][i]:.1f}%"
+        }
+    }
+
+
+def score_landmarks(landmarks: np.ndarray, sizes) -> List[Dict[str, Any]]:
+    """Scores a stack of faces in one vectorized pass and returns one report per face."""
+    return build_reports(compute_metrics(landmarks, sizes))
+
+
+def score_profiles(landmarks: np.ndarray, sizes, names: List[str]) -> List[Dict[str, Any]]:
+    """Scores of the named profiles (engine.profiles) for each face, all evaluated together over one metrics pass."""
+    result = PROFILES.select(names).evaluate(compute_metrics(landmarks, sizes))
+    return [summarize(result, i) for i in range(len(result[names[0]]["score"]))]
@@ -0,0 +1,117 @@
+import base64
+import json
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from engine.metrics import LANDMARKS
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# ?landmarks= : every mesh point plus the forehead strip, only the named LANDMARKS, or nothing.
+LANDMARK_MODES = ("full", "named", "none")
+# ?encoding= : {"x","y","z"} dicts (the original format), or a packed little-endian array in base64
+# (raw bytes under MessagePack). i16 stores round(v / I16_SCALE), which covers -2..2 in 61 µ-units.
+LANDMARK_ENCODINGS = ("json", "f32", "f16", "i16")
+I16_SCALE = 2.0 ** -14
+
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack")
+
+_NAMES = list(LANDMARKS)
+_NAMED_INDEX = np.array([LANDMARKS[n] for n in _NAMES])
+
+
+def forehead_points(mesh: np.ndarray) -> np.ndarray:
+    """
+    The 22 extrapolated forehead points drawn above the mesh: two rows fanning out from the
+    glabella -> trichion direction. Computed in float64, exactly as the per-point loop did.
+    """
+    g = mesh[168].astype(np.float64)
+    t = mesh[10].astype(np.float64)
+    # Direction vector (upwards)
+    vx, vy = t[0] - g[0], t[1] - g[1]
+    # Face width reference for horizontal spacing (use cheekbones)
+    face_w = abs(float(mesh[454, 0]) - float(mesh[234, 0]))
+    step_x = face_w * 0.11  # Wide spacing
+
+    # A compact strip: 2 rows only (a third row sat too high on the hairline)
+    points = []
+    for row in range(1, 3):
+        v_scale = 0.28 * row  # Compact height
+        width_factor = 1.0 - (row * 0.05)  # Minimal taper
+        base_x = t[0] + vx * v_scale
+        base_y = t[1] + vy * v_scale
+        points.append((base_x, base_y, t[2]))
+        # Side points (fan out with a slight downward curve)
+        for s in range(1, 6):
+            h_offset = (step_x * s) * width_factor
+            curve_drop = (s * 0.015) * face_w
+            points.append((base_x - h_offset, base_y + curve_drop, t[2]))
+            points.append((base_x + h_offset, base_y + curve_drop, t[2]))
+    return np.array(points, dtype=np.float64)
+
+
+def _pack(points: np.ndarray, encoding: str, binary: bool) -> Dict[str, Any]:
+    if encoding == "f32":
+        packed = points.astype("<f4")
+    elif encoding == "f16":
+        packed = points.astype("<f2")
+    else:
+        packed = np.clip(np.rint(points / I16_SCALE), -32768, 32767).astype("<i2")
+    data = packed.tobytes()
+    out = {"encoding": encoding, "shape": list(points.shape),
+           "data": data if binary else base64.b64encode(data).decode("ascii")}
+    if encoding == "i16":
+        out["scale"] = I16_SCALE
+    return out
+
+
+def encode_landmarks(mesh: np.ndarray, mode: str = "full", encoding: str = "json",
+                     binary: bool = False) -> Optional[Any]:
+    """
+    Renders a (478, 3) normalized mesh for a response. Returns None for mode "none".
+    `binary` leaves packed arrays as raw bytes (for MessagePack bodies) instead of base64 text.
+    """
+    if mode == "none":
+        return None
+    if mode == "named":
+        points = mesh[_NAMED_INDEX]
+        if encoding == "json":
+            return {n: {"x": x, "y": y, "z": z} for n, (x, y, z) in zip(_NAMES, points.tolist())}
+        return {"names": _NAMES, **_pack(points, encoding, binary)}
+
+    forehead = forehead_points(mesh)
+    if encoding == "json":
+        return [{"x": x, "y": y, "z": z} for x, y, z in mesh.tolist() + forehead.tolist()]
+    return _pack(np.concatenate([mesh.astype(np.float64), forehead]), encoding, binary)
+
+
+def mesh_to_text(mesh: np.ndarray) -> str:
+    """Compact JSON-safe form of a mesh for cache entries (base64 float32)."""
+    return base64.b64encode(np.ascontiguousarray(mesh, dtype="<f4").tobytes()).decode("ascii")
+
+
+def mesh_from_text(text: str) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(text), dtype="<f4").reshape(-1, 3)
+
+
+def wants_msgpack(accept: Optional[str]) -> bool:
+    """True when the Accept header asks for MessagePack and it is installed."""
+    return msgpack is not None and bool(accept) and any(t in accept for t in MSGPACK_TYPES)
+
+
+def dumps(body: Any, use_msgpack: bool = False) -> bytes:
+    """Serializes a response body: MessagePack, or JSON via orjson when available."""
+    if use_msgpack:
+        return msgpack.packb(body, use_bin_type=True)
+    if orjson is not None:
+        return orjson.dumps(body)
+    return json.dumps(body, separators=(",", ":")).encode()
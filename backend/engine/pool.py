@@ -0,0 +1,153 @@
+import asyncio
+import itertools
+import math
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, List, Optional
+
+from engine.telemetry import STAGE_SECONDS
+
+
+# Queue priorities (lower runs first): interactive requests always overtake queued bulk work
+# (batches, background jobs) that is waiting for a worker.
+INTERACTIVE = 0
+BULK = 10
+_SHUTDOWN = float("inf")  # stop markers sort after all remaining work
+
+
+class PoolSaturated(Exception):
+    """Raised when the pool's backlog is full; the caller should retry after `retry_after` seconds."""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Analysis pool is saturated")
+        self.retry_after = retry_after
+
+
+def _resolve(future: asyncio.Future, result: Any, error: Optional[BaseException]):
+    # The awaiting request may have been cancelled (client went away) while we were working.
+    if future.cancelled():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+def _default_engine():
+    from engine.morphology import MorphologyEngine
+    engine = MorphologyEngine()
+    engine.warm_up()
+    return engine
+
+
+class _ThreadRunner:
+    """Executes engine calls in the calling worker thread on an engine it owns exclusively."""
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def wait_ready(self):
+        pass
+
+    def run(self, method: str, args: tuple) -> Any:
+        return getattr(self.engine, method)(*args)
+
+    def close(self):
+        close = getattr(self.engine, "close", None)
+        if close:
+            close()
+
+
+class EnginePool:
+    """
+    Runs engine calls off the event loop on a fixed set of worker threads.
+
+    A FaceLandmarker is not safe to share across threads, so each worker owns exactly one
+    runner (here: one MorphologyEngine) for its whole life. Work is handed over through a priority
+    queue whose depth is bounded by `max_queue`; beyond that, `call` raises PoolSaturated instead of
+    piling up. Subclasses change where the work actually executes by overriding `_open_runner`.
+    """
+
+    def __init__(self, size: Optional[int] = None, max_queue: Optional[int] = None,
+                 engine_factory: Optional[Callable[[], Any]] = None):
+        self.size = size or os.cpu_count() or 1
+        self.max_queue = max_queue if max_queue is not None else self.size * 4
+        self._engine_factory = engine_factory or _default_engine
+        self._queue = queue.PriorityQueue()
+        self._seq = itertools.count()  # FIFO within a priority
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._busy = 0
+        self._avg_seconds = 1.0  # EMA of service time, used for Retry-After hints
+
+        runners = [self._open_runner(i) for i in range(self.size)]
+        for runner in runners:
+            runner.wait_ready()
+        self._threads: List[threading.Thread] = []
+        for i, runner in enumerate(runners):
+            t = threading.Thread(target=self._worker, args=(runner,), name=f"morphology-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def _open_runner(self, index: int):
+        return _ThreadRunner(self._engine_factory())
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queued
+
+    @property
+    def busy(self) -> int:
+        return self._busy
+
+    async def call(self, method: str, *args, wait: bool = False, priority: int = INTERACTIVE) -> Any:
+        """
+        Runs `engine.<method>(*args)` on a free engine and returns its result.
+        With wait=False (interactive requests) a full backlog raises PoolSaturated;
+        wait=True callers bound their own concurrency and are always queued.
+        Queued calls are served lowest `priority` first (INTERACTIVE before BULK).
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            if not wait and self._queued >= self.max_queue:
+                raise PoolSaturated(self._retry_after())
+            self._queued += 1
+        self._queue.put((priority, next(self._seq), (method, args, loop, future, time.perf_counter())))
+        return await future
+
+    def _retry_after(self) -> int:
+        # Time for the current backlog to drain through every worker, at least one second.
+        return max(1, math.ceil(self._avg_seconds * (self._queued + 1) / self.size))
+
+    def _worker(self, runner):
+        while True:
+            _, _, item = self._queue.get()
+            if item is None:
+                break
+            method, args, loop, future, enqueued = item
+            with self._lock:
+                self._queued -= 1
+                self._busy += 1
+            start = time.perf_counter()
+            STAGE_SECONDS.observe(start - enqueued, "queue")
+            result, error = None, None
+            try:
+                result = runner.run(method, args)
+            except Exception as e:
+                error = e
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._busy -= 1
+                self._avg_seconds = 0.8 * self._avg_seconds + 0.2 * elapsed
+            loop.call_soon_threadsafe(_resolve, future, result, error)
+        runner.close()
+
+    def shutdown(self):
+        """Lets queued work finish, then stops the workers and closes their engines."""
+        for _ in self._threads:
+            self._queue.put((_SHUTDOWN, next(self._seq), None))
+        for t in self._threads:
+            t.join()
@@ -0,0 +1,365 @@
+"""
+Population statistics over every analyzed face.
+
+Each measurement of the metrics kernel gets a streaming mean/variance (Welford, merged per batch with
+Chan's formula) and a merging t-digest for quantiles, so percentile and rarity lookups are a binary
+search over a few hundred centroids, however many faces have been seen. Faces arrive as raw meshes
+and are scored in vectorized batches. Only NumPy is required.
+"""
+import json
+import logging
+import math
+import os
+import tempfile
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from engine.metrics import compute_metrics
+
+logger = logging.getLogger(__name__)
+
+# Public trait name (as in the /analyze report) -> compute_metrics column.
+TRAITS = {
+    "harmonyScore": "overall_score",
+    "symmetryScore": "s_symmetry",
+    "phiRatio": "phi_ratio",
+    "fWHR": "fwhr",
+    "canthalTilt": "avg_eye_tilt",
+    "eyeSpacingRatio": "esr",
+    "eyeAreaRatio": "eye_area_ratio",
+    "mouthNoseRatio": "mouth_nose_ratio",
+    "noseWidthRatio": "nose_width_ratio",
+    "jawToCheekRatio": "jaw_ratio",
+    "chinPhiltrumRatio": "chin_philtrum_ratio",
+    "gonialAngle": "gonial_angle",
+    "thirdsUpper": "thirds_upper",
+    "thirdsMid": "thirds_mid",
+    "thirdsLower": "thirds_lower",
+}
+
+SUMMARY_QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+# Faces needed before percentile and rarity lookups answer: below this the digest's CDF is close to a
+# step function and nearly every value would come back as extremely rare.
+MIN_POPULATION = 50
+
+
+class RunningMoments:
+    """Count, mean and variance of a stream, updated a batch at a time."""
+
+    def __init__(self, count: int = 0, mean: float = 0.0, m2: float = 0.0):
+        self.count, self.mean, self.m2 = count, mean, m2
+
+    def update(self, values: np.ndarray):
+        if len(values) == 0:
+            return
+        mean = float(values.mean())
+        self.merge(RunningMoments(len(values), mean, float(((values - mean) ** 2).sum())))
+
+    def merge(self, other: "RunningMoments"):
+        """Folds in the moments of another stream (Chan's formula)."""
+        n = other.count
+        if n == 0:
+            return
+        total = self.count + n
+        delta = other.mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += other.m2 + delta * delta * self.count * n / total
+        self.count = total
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+    def to_dict(self) -> Dict[str, float]:
+        return {"count": self.count, "mean": self.mean, "m2": self.m2}
+
+
+class TDigest:
+    """
+    Merging t-digest: sorted centroids whose size is capped at 4 * n * q * (1 - q) / compression,
+    so the tails stay precise. New values are buffered and merged in batches.
+    """
+
+    def __init__(self, compression: float = 100, buffer_size: int = 512):
+        self.compression = compression
+        self.buffer_size = buffer_size
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.min, self.max = math.inf, -math.inf
+        self._buffer: List[np.ndarray] = []
+        self._buffer_weights: List[np.ndarray] = []
+        self._buffered = 0.0
+        self._cdf_x = self._cdf_y = None  # interpolation knots, rebuilt after a merge
+
+    @property
+    def count(self) -> float:
+        return float(self.weights.sum()) + self._buffered
+
+    def update(self, values: np.ndarray):
+        if len(values) == 0:
+            return
+        self._push(np.asarray(values, dtype=np.float64), np.ones(len(values)))
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+    def merge(self, other: "TDigest"):
+        """Folds in another digest's centroids (weighted, so the result is as if it saw both streams)."""
+        other._merge()
+        if not len(other.means):
+            return
+        self._push(other.means, other.weights)
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def _push(self, means: np.ndarray, weights: np.ndarray):
+        self._buffer.append(means)
+        self._buffer_weights.append(weights)
+        self._buffered += float(weights.sum())
+        if self._buffered >= self.buffer_size:
+            self._merge()
+
+    def _merge(self):
+        if not self._buffer:
+            return
+        means = np.concatenate([self.means] + self._buffer)
+        weights = np.concatenate([self.weights] + self._buffer_weights)
+        self._buffer, self._buffer_weights, self._buffered = [], [], 0.0
+        order = np.argsort(means, kind="stable")
+        means, weights = means[order], weights[order]
+        total = weights.sum()
+
+        out_m, out_w = [], []
+        cur_m, cur_w, before = means[0], weights[0], 0.0
+        for m, w in zip(means[1:].tolist(), weights[1:].tolist()):
+            q = (before + cur_w + w / 2) / total
+            if cur_w + w <= max(1.0, 4 * total * q * (1 - q) / self.compression):
+                cur_w += w
+                cur_m += (m - cur_m) * w / cur_w
+            else:
+                out_m.append(cur_m)
+                out_w.append(cur_w)
+                before += cur_w
+                cur_m, cur_w = m, w
+        out_m.append(cur_m)
+        out_w.append(cur_w)
+        self.means, self.weights = np.array(out_m), np.array(out_w)
+        self._cdf_x = self._cdf_y = None
+
+    def _knots(self) -> Tuple[np.ndarray, np.ndarray]:
+        self._merge()
+        if self._cdf_x is None:
+            total = self.weights.sum()
+            centers = (np.cumsum(self.weights) - self.weights / 2) / total
+            self._cdf_x = np.concatenate([[self.min], self.means, [self.max]])
+            self._cdf_y = np.concatenate([[0.0], centers, [1.0]])
+        return self._cdf_x, self._cdf_y
+
+    def cdf(self, x: float) -> float:
+        """Fraction of the stream at or below x."""
+        if self.count == 0:
+            return math.nan
+        xs, ys = self._knots()
+        return float(np.interp(x, xs, ys))
+
+    def quantile(self, q: float) -> float:
+        if self.count == 0:
+            return math.nan
+        xs, ys = self._knots()
+        return float(np.interp(q, ys, xs))
+
+    def to_dict(self) -> Dict[str, Any]:
+        self._merge()
+        return {"compression": self.compression, "min": self.min, "max": self.max,
+                "means": self.means.tolist(), "weights": self.weights.tolist()}
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "TDigest":
+        digest = cls(d["compression"])
+        digest.min, digest.max = d["min"], d["max"]
+        digest.means, digest.weights = np.array(d["means"], dtype=np.float64), np.array(d["weights"], dtype=np.float64)
+        return digest
+
+
+def rarity_score(probability: float) -> float:
+    """1 (typical) to 10 (extremely rare) from the two-sided tail probability of a value."""
+    return min(10.0, max(1.0, 1 - math.log10(max(probability, 1e-12)) * 3.5))
+
+
+def rarity_label(score: float) -> str:
+    if score > 8: return "Extremely Rare"
+    if score > 6: return "Distinct"
+    if score > 4: return "Uncommon"
+    return "Typical"
+
+
+def overall_rarity_label(score: float) -> str:
+    if score > 7: return "Statistically Unique"
+    if score > 5: return "High Distinctiveness"
+    if score > 3: return "Above Average"
+    return "Common Morphology"
+
+
+class PopulationStats:
+    """
+    Streaming per-trait statistics of analyzed faces, scoped by engine version (a scoring change
+    starts a new population). Meshes are buffered and scored `batch` at a time; lookups flush the
+    buffer first, so they always include every face added so far. Thread-safe.
+
+    With `path`, the state is saved there as JSON by save() and loaded back on construction. `faces`
+    counts every face added, including those with no finite measurement, so a saved state tells how
+    much of a landmark archive it already covers.
+    """
+
+    def __init__(self, version: str, path: Optional[str] = None, batch: int = 256):
+        self.version = version
+        self.path = path
+        self.batch = batch
+        self._lock = threading.Lock()
+        self._meshes: List[np.ndarray] = []
+        self._sizes: List[Tuple[int, int]] = []
+        self.faces = 0
+        self.moments = {t: RunningMoments() for t in TRAITS}
+        self.digests = {t: TDigest() for t in TRAITS}
+        if path and os.path.exists(path):
+            self._load(path)
+
+    @property
+    def count(self) -> int:
+        with self._lock:
+            return self.moments["harmonyScore"].count + len(self._meshes)
+
+    def add(self, landmarks: np.ndarray, size: Tuple[int, int]):
+        """Queues one analyzed face mesh (478, 3) with its image size (w, h)."""
+        with self._lock:
+            self._meshes.append(np.asarray(landmarks, dtype=np.float32))
+            self._sizes.append(size)
+            self.faces += 1
+            if len(self._meshes) >= self.batch:
+                self._flush()
+
+    def add_many(self, landmarks: np.ndarray, sizes: np.ndarray):
+        """Scores and adds a stack of meshes (N, 478, 3) in one pass."""
+        m = compute_metrics(landmarks, sizes)
+        with self._lock:
+            self._ingest(m)
+            self.faces += len(landmarks)
+
+    def _flush(self):
+        if not self._meshes:
+            return
+        m = compute_metrics(np.stack(self._meshes), np.array(self._sizes))
+        self._meshes, self._sizes = [], []
+        self._ingest(m)
+
+    def merge(self, other: "PopulationStats"):
+        """Folds in every face of `other`: its moments, its digests and the meshes still queued there."""
+        with other._lock, self._lock:
+            for trait in TRAITS:
+                self.moments[trait].merge(other.moments[trait])
+                self.digests[trait].merge(other.digests[trait])
+            self._meshes.extend(other._meshes)
+            self._sizes.extend(other._sizes)
+            self.faces += other.faces
+            if len(self._meshes) >= self.batch:
+                self._flush()
+
+    def _ingest(self, m: Dict[str, np.ndarray]):
+        for trait, column in TRAITS.items():
+            values = np.asarray(m[column], dtype=np.float64)
+            values = values[np.isfinite(values)]
+            self.moments[trait].update(values)
+            self.digests[trait].update(values)
+
+    def describe(self, trait: str) -> Dict[str, Any]:
+        with self._lock:
+            self._flush()
+            moments, digest = self.moments[trait], self.digests[trait]
+            out = {"count": moments.count, "mean": round(moments.mean, 4), "std": round(moments.std, 4)}
+            if moments.count:
+                out.update(min=round(digest.min, 4), max=round(digest.max, 4),
+                           quantiles={f"p{round(q * 100)}": round(digest.quantile(q), 4) for q in SUMMARY_QUANTILES})
+            return out
+
+    def summary(self) -> Dict[str, Any]:
+        return {"version": self.version, "count": self.count,
+                "traits": {trait: self.describe(trait) for trait in TRAITS}}
+
+    def percentile(self, trait: str, value: float) -> Dict[str, Any]:
+        """
+        Where `value` falls in the population: percentile, z-score and rarity (1-10) of `trait`. Below
+        MIN_POPULATION faces only the count is returned.
+        """
+        with self._lock:
+            self._flush()
+            moments, digest = self.moments[trait], self.digests[trait]
+            if moments.count < MIN_POPULATION:
+                return {"trait": trait, "value": value, "count": moments.count}
+            p = digest.cdf(value)
+            score = rarity_score(2 * min(p, 1 - p))
+            std = moments.std
+            return {
+                "trait": trait, "value": value, "count": moments.count,
+                "percentile": round(100 * p, 2),
+                "zScore": round((value - moments.mean) / std, 2) if std else 0.0,
+                "rarity": round(score, 1),
+                "label": rarity_label(score),
+            }
+
+    def rarity(self, values: Dict[str, float]) -> Dict[str, Any]:
+        """Per-trait percentiles for a face plus its mean rarity across the given traits."""
+        details = {t: self.percentile(t, v) for t, v in values.items()}
+        scores = [d["rarity"] for d in details.values() if "rarity" in d]
+        score = sum(scores) / len(scores) if scores else None
+        return {"count": self.count, "score": round(score, 1) if score is not None else None,
+                "label": overall_rarity_label(score) if score is not None else None, "details": details}
+
+    def save(self):
+        """Writes the state to `path` (write-then-rename)."""
+        if not self.path:
+            return
+        with self._lock:
+            self._flush()
+            state = {"version": self.version, "faces": self.faces,
+                     "moments": {t: m.to_dict() for t, m in self.moments.items()},
+                     "digests": {t: d.to_dict() for t, d in self.digests.items()}}
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.path)
+
+    def _load(self, path: str):
+        try:
+            with open(path) as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("Could not read population stats from %s: %s", path, e)
+            return
+        if state.get("version") != self.version:
+            logger.info("Population stats in %s are for %s; starting over for %s", path, state.get("version"), self.version)
+            return
+        for trait in TRAITS:
+            if trait in state["moments"]:
+                self.moments[trait] = RunningMoments(**state["moments"][trait])
+                self.digests[trait] = TDigest.from_dict(state["digests"][trait])
+        # States saved before faces were counted: harmonyScore is finite for every scored face.
+        self.faces = state.get("faces", self.moments["harmonyScore"].count)
+
+    @classmethod
+    def from_store(cls, store, version: str, path: Optional[str] = None, chunk: int = 65536,
+                   start: int = 0, rows: Optional[int] = None) -> "PopulationStats":
+        """
+        Builds the statistics from the faces in a LandmarkStore, rows `start` to `rows` (default: all),
+        in vectorized chunks.
+        """
+        stats = cls(version)
+        stats.path = path
+        landmarks, sizes = store.arrays()
+        stop = len(landmarks) if rows is None else min(rows, len(landmarks))
+        for begin in range(start, stop, chunk):
+            end = min(begin + chunk, stop)
+            stats.add_many(landmarks[begin:end], sizes[begin:end])
+        return stats
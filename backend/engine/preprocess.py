@@ -0,0 +1,93 @@
+import os
+from typing import Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+# MORPH_PREPROCESS_ADAPTIVE=0 always runs CLAHE and gamma, as the engine originally did.
+ADAPTIVE_DEFAULT = os.environ.get("MORPH_PREPROCESS_ADAPTIVE", "1") != "0"
+
+
+def luminance_stats(image: np.ndarray, thumb_side: int = 64) -> Dict[str, float]:
+    """Mean and 5th/95th percentile luma of an RGB image, measured on a tiny thumbnail."""
+    thumb = cv2.resize(image, (thumb_side, thumb_side), interpolation=cv2.INTER_AREA)
+    gray = cv2.cvtColor(thumb, cv2.COLOR_RGB2GRAY)
+    cdf = np.cumsum(np.bincount(gray.ravel(), minlength=256))
+    n = cdf[-1]
+    return {
+        "mean": float(gray.mean()),
+        "p5": float(np.searchsorted(cdf, 0.05 * n)),
+        "p95": float(np.searchsorted(cdf, 0.95 * n)),
+    }
+
+
+class Preprocessor:
+    """
+    Lighting normalization ahead of landmark detection: CLAHE on the LAB lightness channel,
+    then a brightening gamma curve.
+
+    One instance per engine (and therefore per worker): the CLAHE object, the gamma LUT and the
+    frame buffers are built once and reused, so a request allocates nothing when the image size
+    repeats. With `adaptive`, a luminance histogram decides per image whether either step is needed.
+    The returned array is owned by the preprocessor and is overwritten by the next call.
+    """
+
+    def __init__(self, clip_limit: float = 2.0, tile_grid: Tuple[int, int] = (8, 8), gamma: float = 1.2,
+                 adaptive: bool = ADAPTIVE_DEFAULT, min_spread: float = 200, max_mean: float = 150):
+        self.clahe = cv2.createCLAHE(clipLimit=clip_limit, tileGridSize=tile_grid) if clip_limit else None
+        self.gamma_lut = None
+        if gamma and gamma != 1.0:
+            self.gamma_lut = (((np.arange(256) / 255.0) ** (1.0 / gamma)) * 255).astype(np.uint8)
+
+        # Adaptive thresholds: CLAHE is skipped when the 5-95% luma spread already reaches
+        # `min_spread`, gamma when the mean luma is above `max_mean` (brightening would wash it out).
+        self.adaptive = adaptive
+        self.min_spread = min_spread
+        self.max_mean = max_mean
+
+        self._shape = None
+        self._lab = self._lightness = self._out = None
+
+    def plan(self, stats: Dict[str, float]) -> Tuple[bool, bool]:
+        """Returns (apply_clahe, apply_gamma) for an image with the given luminance stats."""
+        apply_clahe = self.clahe is not None
+        apply_gamma = self.gamma_lut is not None
+        if self.adaptive:
+            apply_clahe = apply_clahe and stats["p95"] - stats["p5"] < self.min_spread
+            apply_gamma = apply_gamma and stats["mean"] <= self.max_mean
+        return apply_clahe, apply_gamma
+
+    def _buffers(self, shape):
+        if shape != self._shape:
+            h, w = shape[:2]
+            self._lab = np.empty((h, w, 3), np.uint8)
+            self._lightness = np.empty((h, w), np.uint8)
+            self._out = np.empty((h, w, 3), np.uint8)
+            self._shape = shape
+
+    def __call__(self, image: np.ndarray, stats: Optional[Dict[str, float]] = None) -> np.ndarray:
+        """Normalizes `image`; `stats` are its luminance_stats when the caller already measured them."""
+        if self.adaptive:
+            apply_clahe, apply_gamma = self.plan(stats or luminance_stats(image))
+        else:
+            apply_clahe, apply_gamma = self.plan({})
+        if not (apply_clahe or apply_gamma):
+            return image
+
+        self._buffers(image.shape)
+        out = self._out
+        if apply_clahe:
+            # 1. CLAHE in LAB color space (lightness plane only, written back in place)
+            cv2.cvtColor(image, cv2.COLOR_RGB2LAB, dst=self._lab)
+            cv2.extractChannel(self._lab, 0, dst=self._lightness)
+            self.clahe.apply(self._lightness, dst=self._lightness)
+            cv2.insertChannel(self._lightness, self._lab, 0)
+            cv2.cvtColor(self._lab, cv2.COLOR_LAB2RGB, dst=out)
+            src = out
+        else:
+            src = image
+
+        # 2. Gamma Correction (Normalize brightness)
+        if apply_gamma:
+            cv2.LUT(src, self.gamma_lut, dst=out)
+        return out
@@ -0,0 +1,159 @@
+import logging
+import mmap
+import multiprocessing as mp
+import os
+from multiprocessing import shared_memory
+from typing import Any, NamedTuple, Tuple
+
+import numpy as np
+
+from engine.pool import EnginePool
+
+# Worker processes are always spawned: MediaPipe and OpenCV thread pools do not survive fork().
+_ctx = mp.get_context("spawn")
+
+
+class ShmRef(NamedTuple):
+    """Pointer to an argument that was placed in a shared-memory segment instead of being pickled."""
+    name: str
+    shape: Tuple[int, ...]
+    dtype: str
+    is_bytes: bool
+
+
+def _to_shm(arg) -> Tuple[Any, Any]:
+    """Moves byte buffers and arrays into shared memory. Returns (wire_arg, segment_or_None)."""
+    if isinstance(arg, np.ndarray):
+        array, is_bytes = np.ascontiguousarray(arg), False
+    elif isinstance(arg, (bytes, bytearray, memoryview, mmap.mmap)):
+        array, is_bytes = np.frombuffer(arg, dtype=np.uint8), True
+    else:
+        return arg, None
+
+    shm = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+    return ShmRef(shm.name, array.shape, array.dtype.str, is_bytes), shm
+
+
+def _process_main(conn):
+    """Inference process: loads and warms the model once, then serves calls sent over `conn` until told to stop."""
+    # Spawned children start with unconfigured logging (unless they re-import main); mirror the server setup.
+    logging.basicConfig(level=os.environ.get("MORPH_LOG_LEVEL", "INFO").upper(),
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    from engine.morphology import MorphologyEngine
+    engine = MorphologyEngine()
+    engine.warm_up()
+    conn.send(("ready", None))
+
+    while True:
+        try:
+            msg = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break  # parent went away
+        if msg is None:
+            break
+
+        method, wire_args = msg
+        segments, views, args = [], [], []
+        for a in wire_args:
+            if isinstance(a, ShmRef):
+                shm = shared_memory.SharedMemory(name=a.name)
+                segments.append(shm)
+                if a.is_bytes:
+                    view = shm.buf[:a.shape[0]]
+                    views.append(view)
+                    args.append(view)
+                else:
+                    args.append(np.ndarray(a.shape, dtype=np.dtype(a.dtype), buffer=shm.buf))
+            else:
+                args.append(a)
+
+        try:
+            reply = ("ok", getattr(engine, method)(*args))
+        except Exception as e:
+            # Tracebacks pin the frames that still reference shared memory; drop them before closing.
+            e.__traceback__ = e.__context__ = e.__cause__ = None
+            reply = ("error", e)
+        finally:
+            del args
+            for view in views:
+                view.release()
+            for shm in segments:
+                shm.close()
+
+        try:
+            conn.send(reply)
+        except Exception as e:
+            # Result or exception that cannot be pickled; report it as a plain error.
+            conn.send(("error", RuntimeError(f"{type(e).__name__}: {e}")))
+
+    engine.close()
+
+
+class _ProcessRunner:
+    """Dispatcher-side handle on one inference process. Used by exactly one pool worker thread."""
+
+    def __init__(self):
+        self._start()
+
+    def _start(self):
+        self.conn, child_conn = _ctx.Pipe()
+        self.process = _ctx.Process(target=_process_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self._ready = False
+
+    def wait_ready(self):
+        if not self._ready:
+            self.conn.recv()
+            self._ready = True
+
+    def run(self, method: str, args: tuple) -> Any:
+        segments = []
+        try:
+            wire_args = []
+            for a in args:
+                wire, shm = _to_shm(a)
+                wire_args.append(wire)
+                if shm is not None:
+                    segments.append(shm)
+
+            try:
+                self.wait_ready()
+                self.conn.send((method, tuple(wire_args)))
+                status, value = self.conn.recv()
+            except (EOFError, OSError):
+                # The inference process died (e.g. native crash on a hostile input); replace it.
+                self.process.join(timeout=1)
+                self._start()
+                raise RuntimeError("Inference process crashed while handling the request")
+        finally:
+            for shm in segments:
+                shm.close()
+                shm.unlink()
+
+        if status == "error":
+            raise value
+        return value
+
+    def close(self):
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.terminate()
+
+
+class ProcessEnginePool(EnginePool):
+    """
+    EnginePool whose workers forward calls to dedicated inference processes.
+
+    Each process loads `face_landmarker.task` once at startup. Image bytes and frames are handed
+    over through shared-memory segments rather than pickled through the pipe, so the API process
+    only does HTTP, JSON and a memcpy per request, and CPU-bound decode/inference scales past the GIL.
+    """
+
+    def _open_runner(self, index: int):
+        return _ProcessRunner()
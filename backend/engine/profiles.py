@@ -0,0 +1,261 @@
+"""
+Declarative scoring profiles.
+
+A profile turns the metrics kernel's measurements into one 0-100 score:
+  terms     measurement -> curve -> 0-100 term score, combined by weight (weights are normalized)
+  bonuses   named tiers of multiplicative factors; the first rule whose conditions all hold applies
+  verdicts  groups of texts; the first matching rule of each group contributes its text
+Conditions are [name, op, value] with op one of > >= < <=; a name is "score" (verdicts only), one of
+the profile's terms or a measurement column.
+
+Curves: none (the measurement already is a 0-100 score); {"band": [lo, hi], "sigma": s}, 100 inside the
+band and a Gaussian fall-off outside (lo == hi gives a plain peak); {"segments": [[start, y0, x0, slope],
+...], "min", "max"}, piecewise linear y0 + slope * (x - x0) from each start (null for -inf), clipped.
+
+Profiles are read from engine/profiles.json plus the file named by MORPH_PROFILES, and compiled once
+into index, weight and threshold arrays, so any number of them score a stack of faces together in a
+handful of vectorized operations. The engine's own harmonyScore is the "harmony" profile.
+"""
+import json
+import os
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles.json")
+HARMONY = "harmony"
+
+_OPS = (">", ">=", "<", "<=")
+
+
+class ProfileError(ValueError):
+    """A profile definition that cannot be compiled, or a request for an unknown profile."""
+
+
+def load_profiles(extra: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    The built-in profiles plus those in `extra` (a JSON file of the same shape). Extra profiles may add
+    markets or replace built-in ones, except "harmony": it defines harmonyScore, which cached results
+    and the population statistics are scoped to, so it only changes with the engine version.
+    """
+    with open(DEFAULT_PATH) as f:
+        profiles = json.load(f)
+    if extra:
+        with open(extra) as f:
+            added = json.load(f)
+        if HARMONY in added:
+            raise ProfileError(f"{extra}: the '{HARMONY}' profile is part of the engine and cannot be overridden.")
+        profiles.update(added)
+    return profiles
+
+
+class ProfileSet:
+    """A set of profiles compiled for vectorized evaluation. Build subsets with select()."""
+
+    def __init__(self, specs: Dict[str, Dict[str, Any]]):
+        self.specs = specs
+        self.names = list(specs)
+        self._subsets: Dict[tuple, "ProfileSet"] = {}
+
+        # Terms of every profile, side by side: column t of the term matrix is one term.
+        self.term_profile: List[int] = []
+        self.term_names: List[str] = []
+        self.measures: List[str] = []
+        weights: List[float] = []
+        band, band_lo, band_hi, band_sigma = [], [], [], []
+        self._segments = []
+        for p, (name, spec) in enumerate(specs.items()):
+            terms = spec.get("terms") or {}
+            if not terms:
+                raise ProfileError(f"Profile '{name}' has no terms.")
+            for term, t in terms.items():
+                index = len(self.measures)
+                self.term_profile.append(p)
+                self.term_names.append(term)
+                self.measures.append(t.get("measure", term))
+                weights.append(float(t.get("weight", 1.0)))
+                curve = t.get("curve")
+                if curve is None:
+                    continue
+                if "band" in curve:
+                    lo, hi = curve["band"]
+                    band.append(index)
+                    band_lo.append(lo)
+                    band_hi.append(hi)
+                    band_sigma.append(curve["sigma"])
+                elif "segments" in curve:
+                    pieces = np.array([[-np.inf if s[0] is None else s[0]] + list(s[1:]) for s in curve["segments"]], dtype=np.float64)
+                    if pieces.shape[1] != 4 or np.any(np.diff(pieces[:, 0]) <= 0):
+                        raise ProfileError(f"Profile '{name}', term '{term}': segments are [start, y0, x0, slope] with increasing starts.")
+                    self._segments.append((index, pieces, curve.get("min", -np.inf), curve.get("max", np.inf)))
+                else:
+                    raise ProfileError(f"Profile '{name}', term '{term}': unknown curve {sorted(curve)}.")
+
+        self._term_index = {(p, term): t for t, (p, term) in enumerate(zip(self.term_profile, self.term_names))}
+        self.term_profile_arr = np.array(self.term_profile)
+        self.weights = np.zeros((len(self.measures), len(self.names)))
+        self.weights[np.arange(len(self.measures)), self.term_profile_arr] = weights
+        self._band = np.array(band, dtype=np.intp)
+        self._band_lo, self._band_hi = np.array(band_lo, dtype=np.float64), np.array(band_hi, dtype=np.float64)
+        self._band_sigma = np.array(band_sigma, dtype=np.float64)
+
+        # Bonus and verdict rules, each (profile, group, factor or text, [condition indices]); conditions
+        # are (profile, "score" | "term" | "measure", term index or column name, op, value).
+        self._conditions: List[tuple] = []
+        self._bonuses = []
+        self._verdicts = []
+        for p, (name, spec) in enumerate(specs.items()):
+            terms = set((spec.get("terms") or {}))
+            for group, rules in (spec.get("bonuses") or {}).items():
+                for rule in rules:
+                    self._bonuses.append((p, group, float(rule["factor"]), self._compile_when(name, terms, rule, False)))
+            for g, rules in enumerate(spec.get("verdicts") or []):
+                for rule in rules:
+                    self._verdicts.append((p, g, rule["text"], self._compile_when(name, terms, rule, True)))
+        ops = [c[3] for c in self._conditions]
+        self._cond_op = np.array([_OPS.index(op) for op in ops], dtype=np.intp)
+        self._cond_value = np.array([c[4] for c in self._conditions], dtype=np.float64)
+
+    def _compile_when(self, profile: str, terms, rule: Dict[str, Any], allow_score: bool) -> List[int]:
+        indices = []
+        for name, op, value in rule["when"]:
+            if op not in _OPS:
+                raise ProfileError(f"Profile '{profile}': unknown operator '{op}' (use one of {' '.join(_OPS)}).")
+            if name == "score" and not allow_score:
+                raise ProfileError(f"Profile '{profile}': bonuses cannot depend on the score they scale.")
+            # Term names are resolved per profile; anything else is a measurement column.
+            p = self.names.index(profile)
+            source = "score" if name == "score" else ("term" if name in terms else "measure")
+            indices.append(len(self._conditions))
+            self._conditions.append((p, source, self._term_index[p, name] if source == "term" else name, op, float(value)))
+        return indices
+
+    def select(self, names: Sequence[str]) -> "ProfileSet":
+        """The compiled subset for `names` (compiled once per distinct selection)."""
+        key = tuple(names)
+        subset = self._subsets.get(key)
+        if subset is None:
+            unknown = [n for n in names if n not in self.specs]
+            if unknown:
+                raise ProfileError(f"Unknown profile(s): {', '.join(unknown)}. Known profiles: {', '.join(self.names)}.")
+            subset = self._subsets[key] = ProfileSet({n: self.specs[n] for n in names})
+        return subset
+
+    def _term_scores(self, m: Dict[str, np.ndarray], n: int) -> np.ndarray:
+        """(N, T) term scores; terms whose measurement is missing from `m` are NaN."""
+        nan = np.full(n, np.nan)
+        x = np.stack([np.asarray(m[name], dtype=np.float64) if name in m else nan for name in self.measures], axis=1)
+        s = x.copy()
+        if len(self._band):
+            xb = x[:, self._band]
+            target = np.clip(xb, self._band_lo, self._band_hi)
+            s[:, self._band] = np.clip(100 * np.exp(-0.5 * ((xb - target) / self._band_sigma) ** 2), 0, 100)
+        for t, pieces, lo, hi in self._segments:
+            xt = x[:, t]
+            # NaN sorts past every start, so it takes the last piece and stays NaN.
+            k = np.searchsorted(pieces[:, 0], xt, side="right") - 1
+            piece = pieces[np.maximum(k, 0)]
+            s[:, t] = np.clip(piece[:, 1] + piece[:, 3] * (xt - piece[:, 2]), lo, hi)
+        return s
+
+    def _holds(self, values: np.ndarray, indices) -> np.ndarray:
+        """(N, C) truth of the conditions `indices` for their gathered operand values (N, C)."""
+        op, value = self._cond_op[indices], self._cond_value[indices]
+        with np.errstate(invalid="ignore"):
+            return np.where(op == 0, values > value, np.where(op == 1, values >= value,
+                            np.where(op == 2, values < value, values <= value)))
+
+    def _operands(self, indices, m: Dict[str, np.ndarray], terms: np.ndarray, scores: Optional[np.ndarray], n: int) -> np.ndarray:
+        columns = []
+        for i in indices:
+            p, source, name, _, _ = self._conditions[i]
+            if source == "score":
+                columns.append(scores[:, p])
+            elif source == "term":
+                columns.append(terms[:, name])
+            else:
+                columns.append(np.asarray(m[name], dtype=np.float64) if name in m else np.full(n, np.nan))
+        return np.stack(columns, axis=1) if columns else np.empty((n, 0))
+
+    def evaluate(self, m: Dict[str, np.ndarray], verdicts: bool = True) -> Dict[str, Dict[str, Any]]:
+        """
+        Scores every profile of the set over `m` (compute_metrics output, or any columns of it: terms
+        whose measurement is missing are left out and the remaining weights renormalized).
+        Returns {profile: {"score", "base", "terms": {term: array}, "factors": {bonus: array},
+        "verdicts": [text per face]}} with (N,) arrays.
+        """
+        n = len(next(iter(m.values())))
+        terms = self._term_scores(m, n)
+        present = np.array([name in m for name in self.measures])
+        weights = self.weights * present[:, None]
+        total = weights.sum(axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            base = np.where(present, terms, 0) @ weights / np.where(total > 0, total, np.nan)
+
+        # Bonus tiers: every rule's truth in one comparison, then the first match per tier wins.
+        all_bonus = [i for _, _, _, idx in self._bonuses for i in idx]
+        holds = self._holds(self._operands(all_bonus, m, terms, None, n), all_bonus)
+        column = {i: c for c, i in enumerate(all_bonus)}
+        factors: Dict[int, Dict[str, np.ndarray]] = {p: {} for p in range(len(self.names))}
+        for p, group, factor, idx in reversed(self._bonuses):
+            hit = holds[:, [column[i] for i in idx]].all(axis=1)
+            factors[p][group] = np.where(hit, factor, factors[p].get(group, np.ones(n)))
+        scores = base.copy()
+        for p in range(len(self.names)):
+            for group in dict.fromkeys(g for q, g, _, _ in self._bonuses if q == p):  # declaration order
+                scores[:, p] = scores[:, p] * factors[p][group]
+        scores = np.clip(scores, 0, 100)
+
+        texts = self._verdict_texts(m, terms, scores, n) if verdicts else None
+        out = {}
+        for p, name in enumerate(self.names):
+            out[name] = {
+                "score": scores[:, p], "base": base[:, p],
+                "terms": {self.term_names[t]: terms[:, t] for t in np.flatnonzero(self.term_profile_arr == p)},
+                "factors": factors[p],
+                "verdicts": texts[p] if texts is not None else None,
+            }
+        return out
+
+    def _verdict_texts(self, m, terms, scores, n) -> List[List[str]]:
+        all_verdict = [i for _, _, _, idx in self._verdicts for i in idx]
+        holds = self._holds(self._operands(all_verdict, m, terms, scores, n), all_verdict)
+        column = {i: c for c, i in enumerate(all_verdict)}
+        # Each group's text per face (first matching rule, "" when none), then joined per face.
+        groups: Dict[tuple, np.ndarray] = {}
+        for p, g, text, idx in reversed(self._verdicts):
+            hit = holds[:, [column[i] for i in idx]].all(axis=1)
+            groups[p, g] = np.where(hit, text, groups.get((p, g), np.full(n, "", dtype=object)))
+        out = []
+        for p in range(len(self.names)):
+            parts = [groups[key] for key in sorted(groups) if key[0] == p]
+            out.append([" ".join(filter(None, face)) for face in zip(*parts)] if parts else [""] * n)
+        return out
+
+    def verdicts(self, m: Dict[str, np.ndarray], score: np.ndarray) -> List[str]:
+        """
+        Verdict texts of the set's single profile for faces whose score and term values are already
+        in `m` (as compute_metrics stores the harmony profile's).
+        """
+        n = len(score)
+        terms = np.stack([np.asarray(m[t], dtype=np.float64) for t in self.term_names], axis=1)
+        return self._verdict_texts(m, terms, np.asarray(score, dtype=np.float64)[:, None], n)[0]
+
+
+def summarize(result: Dict[str, Dict[str, Any]], i: int = 0, specs: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """Face `i` of evaluate() output as a JSON-ready {profile: {"score", "terms", "verdict"[, "description"]}}."""
+    out = {}
+    for name, r in result.items():
+        score = float(r["score"][i])
+        entry = {"score": round(score, 1) if np.isfinite(score) else None,
+                 "terms": {t: round(float(v[i]), 1) for t, v in r["terms"].items() if np.isfinite(v[i])}}
+        if r["verdicts"] is not None and r["verdicts"][i]:
+            entry["verdict"] = r["verdicts"][i]
+        if specs is not None and "description" in specs[name]:
+            entry["description"] = specs[name]["description"]
+        out[name] = entry
+    return out
+
+
+# Compiled at import: a bad MORPH_PROFILES file fails at startup, not on the first request.
+PROFILES = ProfileSet(load_profiles(os.environ.get("MORPH_PROFILES") or None))
@@ -0,0 +1,145 @@
+"""
+Input quality gate.
+
+Cheap checks that run before the expensive stages: blur, exposure and resolution are measured on a
+thumbnail right after decode, head pose and face size right after detection. Each problem is an issue
+with a machine-readable `code`; "reject" issues stop the analysis (QualityRejected, a 422 at the API)
+and "warn" issues are reported alongside the scores.
+
+OpenCV is imported inside the measuring functions, so the API process can import this module (for
+QualityRejected) without loading it.
+"""
+import math
+import os
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+# MORPH_QUALITY_GATE: "reject" stops bad inputs early, "flag" only reports issues, "off" skips the checks.
+GATE_MODE = os.environ.get("MORPH_QUALITY_GATE", "reject")
+
+# code -> (measurement, reject limit, warn limit, direction). "min" issues fire below the limit,
+# "max" issues above it. Reject limits are deliberately loose: only inputs that cannot give
+# meaningful numbers are refused.
+THRESHOLDS = {
+    "low_resolution": ("minSide", 128, 400, "min"),         # short edge of the upload, pixels
+    "blurry": ("blur", 8.0, 40.0, "min"),                   # Laplacian variance on a 256px thumbnail
+    "underexposed": ("brightness", 25.0, 55.0, "min"),      # mean luma, 0-255
+    "overexposed": ("brightness", 235.0, 215.0, "max"),
+    "low_contrast": ("contrast", 12.0, 40.0, "min"),        # 5-95% luma spread
+    "face_too_small": ("faceWidth", 64, 160, "min"),        # cheekbone-to-cheekbone, original pixels
+    "head_turned": ("yaw", 40.0, 20.0, "max"),              # degrees, absolute
+    "head_tilted": ("pitch", 35.0, 20.0, "max"),
+    "head_rolled": ("roll", 45.0, 15.0, "max"),
+}
+
+BLUR_SIDE = 256
+
+
+class QualityRejected(Exception):
+    """Raised when an input fails the quality gate; `quality` holds the measurements and issues."""
+
+    def __init__(self, quality: Dict[str, Any]):
+        super().__init__(quality)
+        self.quality = quality
+
+    @property
+    def reason(self) -> str:
+        return next(i["code"] for i in self.quality["issues"] if i["severity"] == "reject")
+
+    def detail(self) -> Dict[str, Any]:
+        return {"reason": self.reason, "message": _MESSAGES.get(self.reason, "Image rejected."),
+                "quality": self.quality}
+
+
+_MESSAGES = {
+    "low_resolution": "Image resolution is too low for analysis.",
+    "blurry": "Image is too blurry for analysis.",
+    "underexposed": "Image is too dark for analysis.",
+    "overexposed": "Image is too bright for analysis.",
+    "low_contrast": "Image has too little contrast for analysis.",
+    "face_too_small": "Face is too small in the image for analysis.",
+    "head_turned": "Head is turned too far from the camera.",
+    "head_tilted": "Head is tilted too far up or down.",
+    "head_rolled": "Head is rotated too far; upload an upright photo.",
+}
+
+
+def _check(quality: Dict[str, Any], codes) -> None:
+    issues = quality.setdefault("issues", [])
+    for code in codes:
+        key, reject, warn, direction = THRESHOLDS[code]
+        value = quality.get(key)
+        if value is None:
+            continue
+        v = abs(value) if key in ("yaw", "pitch", "roll") else value
+        for severity, limit in (("reject", reject), ("warn", warn)):
+            if (v < limit) if direction == "min" else (v > limit):
+                issues.append({"code": code, "severity": severity, "value": round(float(value), 2), "limit": limit})
+                break
+
+
+def measure_image(image: np.ndarray, size: Tuple[int, int]) -> Dict[str, Any]:
+    """
+    Pre-inference measurements of a decoded RGB image, plus the luminance stats the preprocessor
+    plans its corrections from (under "luma", so they are not computed twice).
+    """
+    import cv2
+    from engine.preprocess import luminance_stats
+
+    h, w = image.shape[:2]
+    scale = BLUR_SIDE / max(w, h)
+    thumb = cv2.resize(image, (max(1, round(w * scale)), max(1, round(h * scale))), interpolation=cv2.INTER_AREA) if scale < 1 else image
+    gray = cv2.cvtColor(thumb, cv2.COLOR_RGB2GRAY)
+    stats = luminance_stats(image)
+    quality = {
+        "minSide": int(min(size)),
+        "blur": round(float(cv2.Laplacian(gray, cv2.CV_64F).var()), 2),
+        "brightness": round(stats["mean"], 1),
+        "contrast": stats["p95"] - stats["p5"],
+        "luma": stats,
+    }
+    _check(quality, ("low_resolution", "blurry", "underexposed", "overexposed", "low_contrast"))
+    return quality
+
+
+def head_pose(matrix: Optional[np.ndarray], landmarks: np.ndarray, size: Tuple[int, int]) -> Dict[str, float]:
+    """
+    (yaw, pitch, roll) in degrees. Taken from MediaPipe's facial transformation matrix when available;
+    otherwise roll comes from the eye line and yaw from the nose tip's offset, without pitch.
+    """
+    if matrix is not None:
+        r = np.asarray(matrix, dtype=np.float64)[:3, :3]
+        r = r / np.linalg.norm(r, axis=0)  # drop the matrix's scale
+        pitch = math.degrees(math.atan2(r[2, 1], r[2, 2]))
+        yaw = math.degrees(math.atan2(-r[2, 0], math.hypot(r[2, 1], r[2, 2])))
+        roll = math.degrees(math.atan2(r[1, 0], r[0, 0]))
+        return {"yaw": round(yaw, 1), "pitch": round(pitch, 1), "roll": round(roll, 1)}
+
+    w, h = size
+    eye_l, eye_r = landmarks[33, :2] * (w, h), landmarks[263, :2] * (w, h)
+    roll = math.degrees(math.atan2(eye_r[1] - eye_l[1], eye_r[0] - eye_l[0]))
+    face_w = abs(landmarks[454, 0] - landmarks[234, 0]) or 1e-6
+    offset = (landmarks[1, 0] - (landmarks[454, 0] + landmarks[234, 0]) / 2) / face_w
+    yaw = math.degrees(math.asin(float(np.clip(2 * offset, -1, 1))))
+    return {"yaw": round(yaw, 1), "roll": round(roll, 1)}
+
+
+def check_face(quality: Dict[str, Any], matrix: Optional[np.ndarray], landmarks: np.ndarray,
+               size: Tuple[int, int]) -> None:
+    """Adds post-detection measurements (face width, head pose) and their issues to `quality`."""
+    quality["faceWidth"] = int(abs(float(landmarks[454, 0]) - float(landmarks[234, 0])) * size[0])
+    quality.update(head_pose(matrix, landmarks, size))
+    _check(quality, ("face_too_small", "head_turned", "head_tilted", "head_rolled"))
+
+
+def enforce(quality: Dict[str, Any], mode: str = GATE_MODE) -> None:
+    """Raises QualityRejected when `quality` has a reject issue and the gate is in reject mode."""
+    if mode == "reject" and any(i["severity"] == "reject" for i in quality.get("issues", ())):
+        raise QualityRejected(public(quality))
+
+
+def public(quality: Dict[str, Any]) -> Dict[str, Any]:
+    """The measurements as reported to clients (internal luminance stats dropped)."""
+    return {k: v for k, v in quality.items() if k != "luma"}
+
@@ -0,0 +1,55 @@
+"""
+Offline re-scoring of stored landmarks, no inference involved.
+
+    python -m engine.rescore --store ./landmark_store --out scores.npz [--jsonl reports.jsonl]
+
+Run from the backend directory. Every stored face goes through the current metrics kernel in
+vectorized chunks; `--out` receives one column per measurement plus the image hashes.
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from engine.landmark_store import LandmarkStore
+from engine.metrics import build_reports, compute_metrics
+
+
+def rescore(store: LandmarkStore, chunk: int = 65536, jsonl_path: str = None):
+    """Returns {column: (N,) array} for every stored face, optionally writing full reports as JSONL."""
+    columns = {}
+    keys = store.keys
+    jsonl = open(jsonl_path, "w") if jsonl_path else None
+    try:
+        for start, landmarks, sizes in store.iter_chunks(chunk):
+            m = compute_metrics(landmarks, sizes)
+            for name, values in m.items():
+                columns.setdefault(name, []).append(values.astype(np.float32))
+            if jsonl:
+                for i, report in enumerate(build_reports(m)):
+                    jsonl.write(json.dumps({"key": keys[start + i], "analysis": report}) + "\n")
+    finally:
+        if jsonl:
+            jsonl.close()
+    return {name: np.concatenate(parts) for name, parts in columns.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-score stored face landmarks with the current metrics.")
+    parser.add_argument("--store", required=True, help="LandmarkStore directory (MORPH_LANDMARK_DIR)")
+    parser.add_argument("--out", default="scores.npz", help="columnar output (.npz)")
+    parser.add_argument("--jsonl", help="also write one full report per face to this JSONL file")
+    parser.add_argument("--chunk", type=int, default=65536, help="faces per vectorized pass")
+    args = parser.parse_args()
+
+    store = LandmarkStore(args.store, readonly=True)
+    start = time.perf_counter()
+    columns = rescore(store, args.chunk, args.jsonl)
+    elapsed = time.perf_counter() - start
+    np.savez(args.out, keys=np.array(store.keys), **columns)
+    print(f"Re-scored {len(store)} faces in {elapsed:.2f}s -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
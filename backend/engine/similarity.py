@@ -0,0 +1,267 @@
+"""
+Nearest-neighbour search over analyzed faces.
+
+A face is described by one float32 vector: the named landmarks aligned to a common frame (centred,
+rotated so the eyes are level, scaled to unit size) followed by the metric kernel's ratios and angles,
+each divided by its typical spread between faces. Distances are Euclidean.
+
+Vectors live in one growing float32 matrix. Small indexes are searched exactly with one matrix-vector
+product; from IVF_MIN faces on, a k-means coarse quantizer (IVF) splits the rows into lists and a query
+only scans the `nprobe` lists nearest to it, still ranked by exact distance. Only NumPy is required.
+"""
+import logging
+import math
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from engine.metrics import LANDMARKS, compute_metrics, to_pixels
+
+logger = logging.getLogger(__name__)
+
+# Landmarks in the geometry part of the vector (the points the metrics kernel reads).
+GEOMETRY_POINTS = np.array(sorted(set(LANDMARKS.values())))
+_EYE_OUTER = (int(np.searchsorted(GEOMETRY_POINTS, LANDMARKS["eyeLeftOuter"])),
+              int(np.searchsorted(GEOMETRY_POINTS, LANDMARKS["eyeRightOuter"])))
+
+# compute_metrics column -> typical spread between faces, so each measurement counts about the same.
+METRIC_SCALES = {
+    "phi_ratio": 0.1, "fwhr": 0.15, "thirds_upper": 2.5, "thirds_lower": 2.5, "esr": 0.1,
+    "avg_eye_tilt": 4.0, "eye_area_ratio": 0.2, "mouth_nose_ratio": 0.15, "nose_width_ratio": 0.03,
+    "jaw_ratio": 0.06, "chin_philtrum_ratio": 0.4, "gonial_angle": 6.0,
+}
+# Aligned unit-size shapes of different people are ~0.1 apart, scaled metric vectors (divided by
+# sqrt of their length) ~1: this weight lets both halves contribute comparably to a distance.
+GEOMETRY_WEIGHT = 8.0
+
+DIM = 2 * len(GEOMETRY_POINTS) + len(METRIC_SCALES)
+
+# MORPH_SIMILAR_IVF_MIN: faces before the IVF index is trained (below it every search is exact).
+IVF_MIN = int(os.environ.get("MORPH_SIMILAR_IVF_MIN", 50000))
+# MORPH_SIMILAR_NPROBE: IVF lists scanned per query; more is slower and closer to exact.
+NPROBE = int(os.environ.get("MORPH_SIMILAR_NPROBE", 16))
+
+
+def face_vectors(landmarks: np.ndarray, sizes) -> np.ndarray:
+    """(N, DIM) float32 feature vectors of one mesh (478, 3) or a stack (N, 478, 3) with image sizes (w, h)."""
+    lm = np.asarray(landmarks)
+    if lm.ndim == 2:
+        lm = lm[None]
+    p, sizes = to_pixels(lm[:, GEOMETRY_POINTS], sizes)
+
+    p = p - p.mean(axis=1, keepdims=True)
+    eye_line = p[:, _EYE_OUTER[1]] - p[:, _EYE_OUTER[0]]
+    angle = np.arctan2(eye_line[:, 1], eye_line[:, 0])
+    cos, sin = np.cos(-angle), np.sin(-angle)
+    rotation = np.stack([np.stack([cos, -sin], axis=-1), np.stack([sin, cos], axis=-1)], axis=-2)
+    p = np.einsum("nij,nkj->nki", rotation, p)
+    norm = np.linalg.norm(p, axis=(1, 2), keepdims=True)
+    geometry = (p / np.where(norm > 0, norm, 1)).reshape(len(p), -1) * GEOMETRY_WEIGHT
+
+    m = compute_metrics(lm, sizes)
+    metrics = np.stack([m[column] / scale for column, scale in METRIC_SCALES.items()], axis=1)
+    metrics /= math.sqrt(len(METRIC_SCALES))
+
+    vectors = np.concatenate([geometry, metrics], axis=1)
+    return np.nan_to_num(vectors, nan=0.0, posinf=0.0, neginf=0.0).astype(np.float32)
+
+
+def _nearest(vectors: np.ndarray, centroids: np.ndarray, chunk: int = 65536) -> np.ndarray:
+    """Index of the nearest centroid for each row, in chunks to bound the distance matrix."""
+    c_norms = (centroids ** 2).sum(axis=1)
+    out = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), chunk):
+        block = vectors[start:start + chunk]
+        out[start:start + chunk] = np.argmin(c_norms - 2 * block @ centroids.T, axis=1)
+    return out
+
+
+def kmeans(vectors: np.ndarray, k: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """(k, D) centroids of `vectors` by Lloyd's algorithm from a random sample of starting points."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), k, replace=False)].astype(np.float32)
+    for _ in range(iterations):
+        assign = _nearest(vectors, centroids)
+        counts = np.bincount(assign, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, vectors)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+        # Empty lists restart from random rows rather than staying dead.
+        if not filled.all():
+            centroids[~filled] = vectors[rng.choice(len(vectors), int((~filled).sum()), replace=False)]
+    return centroids
+
+
+class SimilarityIndex:
+    """
+    Face vectors by image hash, searchable for nearest neighbours. Inserts are incremental: once the
+    IVF quantizer is trained, new rows join their nearest list right away, and maybe_train() retrains
+    it off the request path each time the index has doubled. Thread-safe.
+    """
+
+    def __init__(self, ivf_min: int = IVF_MIN, nprobe: int = NPROBE, capacity: int = 1024):
+        self.ivf_min = ivf_min
+        self.nprobe = nprobe
+        self._lock = threading.Lock()
+        self._vectors = np.empty((capacity, DIM), dtype=np.float32)
+        self._sq_norms = np.empty(capacity, dtype=np.float32)
+        self._lists = np.empty(capacity, dtype=np.int32)
+        self._keys: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._centroids: Optional[np.ndarray] = None
+        self._trained_rows = 0
+        self._training = False
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._rows
+
+    def add(self, key: str, landmarks: np.ndarray, size: Tuple[int, int]) -> bool:
+        """Indexes one face mesh (478, 3). Returns False if this image hash is already indexed."""
+        if key in self._rows:
+            return False
+        return self.add_vectors([key], face_vectors(landmarks, size)) == 1
+
+    def add_many(self, keys: List[str], landmarks: np.ndarray, sizes: np.ndarray) -> int:
+        """Indexes a stack of meshes (N, 478, 3) in one vectorized pass; returns how many were new."""
+        return self.add_vectors(keys, face_vectors(landmarks, sizes))
+
+    def add_vectors(self, keys: List[str], vectors: np.ndarray) -> int:
+        with self._lock:
+            seen = set(self._rows)
+            fresh = [i for i, key in enumerate(keys) if not (key in seen or seen.add(key))]
+            if not fresh:
+                return 0
+            vectors = vectors[fresh]
+            start, end = len(self._keys), len(self._keys) + len(fresh)
+            self._reserve(end)
+            self._vectors[start:end] = vectors
+            self._sq_norms[start:end] = (vectors ** 2).sum(axis=1)
+            self._lists[start:end] = _nearest(vectors, self._centroids) if self._centroids is not None else -1
+            for i in fresh:
+                self._rows[keys[i]] = len(self._keys)
+                self._keys.append(keys[i])
+            return len(fresh)
+
+    def merge(self, other: "SimilarityIndex") -> int:
+        """Adds every face of `other` not indexed here yet; returns how many were new."""
+        with other._lock:
+            keys = [key for key in other._keys if key not in self._rows]
+            vectors = other._vectors[[other._rows[key] for key in keys]]
+        return self.add_vectors(keys, vectors) if keys else 0
+
+    def _reserve(self, rows: int):
+        if rows <= len(self._vectors):
+            return
+        capacity = max(rows, 2 * len(self._vectors))
+        # Grown into new arrays, so a training pass reading the old ones keeps a consistent snapshot.
+        for name in ("_vectors", "_sq_norms", "_lists"):
+            old = getattr(self, name)
+            new = np.empty((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:len(self._keys)] = old[:len(self._keys)]
+            setattr(self, name, new)
+
+    def vector(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            row = self._rows.get(key)
+            return None if row is None else self._vectors[row].copy()
+
+    def search(self, query: np.ndarray, k: int = 10, exclude: Optional[str] = None) -> Dict[str, Any]:
+        """
+        The `k` nearest faces to a DIM vector: {"method": "exact" | "ivf", "scanned", "matches":
+        [{"key", "distance"}]} ordered by distance. `exclude` drops one key (the query's own image).
+        """
+        query = np.asarray(query, dtype=np.float32).reshape(DIM)
+        with self._lock:
+            n = len(self._keys)
+            vectors, sq_norms, lists, keys = self._vectors, self._sq_norms, self._lists, self._keys
+            centroids = self._centroids
+            skip = self._rows.get(exclude) if exclude is not None else None
+        # Rows below n never change once written, so the search runs outside the lock.
+        if centroids is None:
+            method, rows = "exact", None
+        else:
+            probe = np.argpartition(((centroids - query) ** 2).sum(axis=1), min(self.nprobe, len(centroids)) - 1)[:self.nprobe]
+            selected = np.zeros(len(centroids), dtype=bool)
+            selected[probe] = True
+            method, rows = "ivf", np.flatnonzero(selected[lists[:n]])
+
+        if rows is None:
+            d2 = sq_norms[:n] - 2 * (vectors[:n] @ query)
+        else:
+            d2 = sq_norms[rows] - 2 * (vectors[rows] @ query)
+        if skip is not None:
+            if rows is None:
+                d2[skip] = np.inf
+            else:
+                d2[rows == skip] = np.inf
+        take = min(k, len(d2))
+        if take == 0:
+            return {"method": method, "scanned": 0, "matches": []}
+        top = np.argpartition(d2, take - 1)[:take]
+        top = top[np.argsort(d2[top], kind="stable")]
+        top = top[np.isfinite(d2[top])]
+        distances = np.sqrt(np.maximum(d2[top] + float(query @ query), 0))
+        found = top if rows is None else rows[top]
+        return {"method": method, "scanned": len(d2),
+                "matches": [{"key": keys[int(r)], "distance": round(float(d), 4)} for r, d in zip(found, distances)]}
+
+    def maybe_train(self) -> bool:
+        """(Re)trains the IVF quantizer when the index has reached IVF_MIN faces or doubled since the last training."""
+        with self._lock:
+            n = len(self._keys)
+            if self._training or n < self.ivf_min or n < 2 * self._trained_rows:
+                return False
+            self._training = True
+            vectors = self._vectors
+        try:
+            self._train(vectors, n)
+        finally:
+            with self._lock:
+                self._training = False
+        return True
+
+    def _train(self, vectors: np.ndarray, n: int, sample: int = 131072):
+        # ~4 sqrt(n) lists keeps both the centroid scan and the rows per list small.
+        k = int(min(4096, max(16, 4 * math.sqrt(n))))
+        rng = np.random.default_rng(0)
+        training = vectors[np.sort(rng.choice(n, min(n, max(sample, 32 * k)), replace=False))] if n > sample else vectors[:n]
+        centroids = kmeans(training, k)
+        lists = _nearest(vectors[:n], centroids)
+        with self._lock:
+            # Rows added while training are assigned now, under the lock, so nothing is left out.
+            total = len(self._keys)
+            tail = _nearest(self._vectors[n:total], centroids) if total > n else np.empty(0, np.int32)
+            # A fresh array, so searches in flight keep lists that match the centroids they read.
+            assigned = self._lists.copy()
+            assigned[:n], assigned[n:total] = lists, tail
+            self._lists = assigned
+            self._centroids = centroids
+            self._trained_rows = n
+        logger.info("Similarity index trained: %d lists over %d faces", k, n)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"count": len(self._keys), "dim": DIM, "method": "exact" if self._centroids is None else "ivf",
+                    "lists": 0 if self._centroids is None else len(self._centroids), "nprobe": self.nprobe,
+                    "bytes": len(self._keys) * DIM * 4}
+
+    @classmethod
+    def from_store(cls, store, chunk: int = 65536, rows: Optional[int] = None, **kwargs) -> "SimilarityIndex":
+        """
+        Indexes the faces in a LandmarkStore (the first `rows`, if given), in vectorized chunks, and
+        trains IVF if it is large enough.
+        """
+        keys = store.keys[:rows]
+        index = cls(capacity=max(1024, len(keys)), **kwargs)
+        for start, landmarks, sizes in store.iter_chunks(chunk):
+            if start >= len(keys):
+                break
+            index.add_many(keys[start:start + len(landmarks)], landmarks[:len(keys) - start], sizes[:len(keys) - start])
+        index.maybe_train()
+        return index
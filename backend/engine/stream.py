@@ -0,0 +1,72 @@
+import time
+from typing import Any, Dict, Optional
+
+import mediapipe as mp
+import numpy as np
+
+from engine.decode import decode_image
+from engine.metrics import build_report, compute_metrics
+from engine.morphology import VisionRunningMode, create_landmarker, landmarks_to_array
+from engine.preprocess import Preprocessor
+
+
+class StreamSession:
+    """
+    Live-camera analysis for one client.
+
+    The session owns a FaceLandmarker in VIDEO running mode, so MediaPipe tracks the face from frame
+    to frame instead of re-running full detection. Landmarks are smoothed with an exponential moving
+    average, and the (comparatively expensive) scoring runs at most `score_hz` times per second; frames
+    in between reuse the last report. Not thread-safe: feed frames one at a time.
+    """
+
+    def __init__(self, score_hz: float = 5.0, smoothing: float = 0.6, max_side: int = 640):
+        self.score_interval = 1.0 / score_hz if score_hz > 0 else 0.0
+        self.smoothing = min(max(smoothing, 0.0), 0.95)
+        self.max_side = max_side
+        self.preprocessor = Preprocessor()
+        self.landmarker = create_landmarker(VisionRunningMode.VIDEO, output_face_blendshapes=False)
+
+        self._t0 = time.monotonic()
+        self._last_ts = -1
+        self._smoothed: Optional[np.ndarray] = None
+        self._report: Optional[Dict[str, Any]] = None
+        self._last_scored = float("-inf")
+        self.frames = 0
+
+    def close(self):
+        self.landmarker.close()
+
+    def _timestamp_ms(self) -> int:
+        # VIDEO mode requires strictly increasing timestamps.
+        ts = max(int((time.monotonic() - self._t0) * 1000), self._last_ts + 1)
+        self._last_ts = ts
+        return ts
+
+    def process_frame(self, frame_bytes: bytes, include_landmarks: bool = True) -> Dict[str, Any]:
+        self.frames += 1
+        image, (w, h) = decode_image(frame_bytes, self.max_side)
+        mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=np.ascontiguousarray(self.preprocessor(image)))
+        result = self.landmarker.detect_for_video(mp_image, self._timestamp_ms())
+
+        if not result.face_landmarks:
+            # Lost the face: restart smoothing so the next detection doesn't blend with a stale pose.
+            self._smoothed = None
+            return {"frame": self.frames, "face": False}
+
+        landmarks = landmarks_to_array(result.face_landmarks[0])
+        if self._smoothed is None:
+            self._smoothed = landmarks
+        else:
+            self._smoothed = self.smoothing * self._smoothed + (1.0 - self.smoothing) * landmarks
+
+        now = time.monotonic()
+        scored = now - self._last_scored >= self.score_interval
+        if scored:
+            self._report = build_report(compute_metrics(self._smoothed, (w, h)))
+            self._last_scored = now
+
+        message = {"frame": self.frames, "face": True, "scored": scored, "analysis": self._report}
+        if include_landmarks:
+            message["landmarks"] = np.round(self._smoothed, 4).ravel().tolist()  # flat [x0, y0, z0, x1, ...]
+        return message
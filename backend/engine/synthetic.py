@@ -0,0 +1,109 @@
+import io
+from typing import Any, Dict, List, Tuple
+
+from PIL import Image, ImageDraw, ImageFilter
+
+# Pixel rotation a camera stores before tagging the file with this EXIF orientation; decoding with the
+# orientation applied gives the upright image back.
+_ORIENTATION_STORE = {
+    1: None,
+    3: Image.Transpose.ROTATE_180,
+    6: Image.Transpose.ROTATE_90,
+    8: Image.Transpose.ROTATE_270,
+}
+
+
+def calibration_canvas(W: int = 600, H: int = 600) -> Tuple[Image.Image, List[Dict[str, float]]]:
+    """
+    White canvas with alignment markers, plus normalized landmarks that sit exactly on them.
+    Used by /debug/calibration to check the frontend overlay.
+    """
+    # 1. Create a White Canvas
+    img = Image.new('RGB', (W, H), color='white')
+    draw = ImageDraw.Draw(img)
+
+    # 2. Draw Visual Markers (Reference Truth)
+    # Center Green Circle
+    cx, cy = W//2, H//2
+    draw.ellipse([cx-10, cy-10, cx+10, cy+10], fill='green', outline='black')
+
+    # Target Box (to show object-fit limits)
+    draw.rectangle([0, 0, W-1, H-1], outline='black', width=5)
+
+    # Corner Red Crosses
+    # Top-Left (0,0)
+    draw.line([0, 0, 50, 50], fill='red', width=3)
+    draw.line([0, 50, 50, 0], fill='red', width=3)
+
+    # Bottom-Right (1,1)
+    draw.line([W-50, H-50, W, H], fill='red', width=3)
+    draw.line([W-50, H, W, H-50], fill='red', width=3)
+
+    # Hairline Bar (Blue) at 5% height
+    hy = int(H * 0.05)
+    draw.line([0, hy, W, hy], fill='blue', width=2)
+
+    # 3. Create Landmark Data that MATCHES exactly
+    # Normalized coordinates [0.0, 1.0]
+    landmarks = []
+
+    # Center point (matches green circle)
+    landmarks.append({"x": 0.5, "y": 0.5, "z": 0})
+
+    # "Hairline" points (match blue line)
+    # 5 points across
+    for i in range(5):
+        landmarks.append({"x": 0.1 + (i * 0.2), "y": 0.05, "z": 0})
+
+    # Corner markers (Exact corners)
+    landmarks.append({"x": 0.0, "y": 0.0, "z": 0})
+    landmarks.append({"x": 1.0, "y": 1.0, "z": 0})
+
+    return img, landmarks
+
+
+def synthetic_face(W: int = 600, H: int = 800) -> Image.Image:
+    """
+    A flat, drawn frontal face on a plain background. Crude, but the face landmarker finds it at any
+    size, so the whole pipeline (metrics included) can be exercised without shipping photos.
+    """
+    img = Image.new('RGB', (W, H), (200, 210, 220))
+    draw = ImageDraw.Draw(img)
+    s = min(W, H)
+    cx, cy = W / 2, H / 2
+
+    # Hair, then the face oval over it
+    draw.ellipse([cx - .42*s, cy - .50*s, cx + .42*s, cy - .05*s], fill=(60, 40, 30))
+    draw.ellipse([cx - .30*s, cy - .40*s, cx + .30*s, cy + .42*s], fill=(224, 172, 140))
+
+    # Eyes (sclera, iris, pupil) and brows
+    for side in (-1, 1):
+        ex, ey = cx + side * .12*s, cy - .08*s
+        draw.ellipse([ex - .065*s, ey - .03*s, ex + .065*s, ey + .03*s], fill='white')
+        draw.ellipse([ex - .028*s, ey - .028*s, ex + .028*s, ey + .028*s], fill=(70, 50, 30))
+        draw.ellipse([ex - .012*s, ey - .012*s, ex + .012*s, ey + .012*s], fill='black')
+        draw.line([ex - .08*s, ey - .08*s, ex + .07*s, ey - .09*s], fill=(60, 40, 30), width=max(1, int(.02*s)))
+
+    # Nose and mouth
+    draw.polygon([(cx, cy - .05*s), (cx - .05*s, cy + .10*s), (cx + .05*s, cy + .10*s)], fill=(200, 140, 110))
+    draw.ellipse([cx - .11*s, cy + .18*s, cx + .11*s, cy + .25*s], fill=(170, 70, 70))
+    draw.line([cx - .10*s, cy + .215*s, cx + .10*s, cy + .215*s], fill=(110, 40, 40), width=max(1, int(.006*s)))
+
+    # Soften the hard polygon edges a little, like a camera would
+    return img.filter(ImageFilter.GaussianBlur(s / 300))
+
+
+def encode_image(img: Image.Image, fmt: str = 'JPEG', orientation: int = 1, **save_options: Any) -> bytes:
+    """
+    Encodes an upright image as an upload would arrive: with `orientation` != 1 the pixels are stored
+    rotated and the EXIF tag says how to undo it, as phone cameras do.
+    """
+    method = _ORIENTATION_STORE[orientation]
+    if method is not None:
+        img = img.transpose(method)
+    exif = Image.Exif()
+    if orientation != 1:
+        exif[0x0112] = orientation
+    buf = io.BytesIO()
+    img.save(buf, format=fmt, exif=exif.tobytes(), **save_options)
+    return buf.getvalue()
@@ -0,0 +1,95 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Latency buckets (seconds): sub-millisecond kernels up to multi-second video requests.
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+STAGES = ("read", "queue", "decode", "exif", "quality", "preprocess", "inference", "metrics", "serialize", "encode", "search")
+
+
+@contextmanager
+def stage(timings: Optional[Dict[str, float]], name: str):
+    """Adds the wall time of the block to timings[name]; a no-op when timings is None."""
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + time.perf_counter() - start
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{v}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+class Histogram:
+    """
+    Cumulative-bucket latency histogram rendered in the Prometheus text exposition format.
+
+    A deliberately small stand-in for prometheus_client: observations are thread-safe, and series are
+    created on first use of a label combination.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # labels -> [per-bucket counts (last one is +Inf), sum]
+        self._series: Dict[Tuple[str, ...], List] = {}
+
+    def observe(self, value: float, *labelvalues: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def observe_all(self, values: Dict[str, float]):
+        """Observes {label value: seconds}, e.g. the per-stage timings of one request."""
+        for label, value in values.items():
+            self.observe(value, label)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((labels, list(counts), total) for labels, (counts, total) in self._series.items())
+        for labels, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {total!r}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+def gauge(name: str, documentation: str, value: float, kind: str = "gauge") -> List[str]:
+    """Renders a single unlabeled gauge (or counter) sample."""
+    return [f"# HELP {name} {documentation}", f"# TYPE {name} {kind}", f"{name} {_format_value(value)}"]
+
+
+# Process-wide series, filled by the API process (engine timings travel back inside each Analysis,
+# so inference processes need no shared state).
+STAGE_SECONDS = Histogram(
+    "morph_stage_seconds", "Time spent per analysis stage.", labelnames=("stage",))
+REQUEST_SECONDS = Histogram(
+    "morph_request_seconds", "End-to-end request latency.", labelnames=("endpoint", "status"))
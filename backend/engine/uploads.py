@@ -0,0 +1,210 @@
+import hashlib
+import io
+import mmap
+import os
+import tempfile
+from typing import TYPE_CHECKING, Optional
+
+
+try:
+    from python_multipart.exceptions import MultipartParseError
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.exceptions import MultipartParseError
+    from multipart.multipart import MultipartParser, parse_options_header
+
+if TYPE_CHECKING:  # engine.decode pulls in OpenCV, which the API process does not otherwise need
+    from engine.decode import Buffer
+
+# MORPH_MAX_UPLOAD_MB caps one image upload; larger bodies are refused with 413 as soon as the limit is
+# crossed (or up front, from Content-Length). Uploads up to MORPH_UPLOAD_SPOOL_MB are kept in memory,
+# larger ones are spooled to an anonymous temp file and memory-mapped for decoding.
+MAX_UPLOAD_BYTES = int(float(os.environ.get("MORPH_MAX_UPLOAD_MB", 32)) * 1024 * 1024)
+SPOOL_BYTES = int(float(os.environ.get("MORPH_UPLOAD_SPOOL_MB", 8)) * 1024 * 1024)
+
+_MULTIPART_OVERHEAD = 64 * 1024  # boundaries and part headers on top of the file itself
+_SNIFF_BYTES = 32
+
+
+class UploadError(Exception):
+    """An upload was refused; carries the HTTP status and message for the client."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def sniff_image(head: bytes) -> Optional[str]:
+    """Identifies an image from its first bytes; None if it is not a format the decoders can read."""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "gif"
+    if head.startswith(b"BM"):
+        return "bmp"
+    if head[:4] in (b"II*\x00", b"MM\x00*"):
+        return "tiff"
+    if head[4:8] == b"ftyp":
+        # ISO-BMFF stills: only accepted when a Pillow plugin can open them (pillow-heif, Pillow's AVIF).
+        from PIL import Image  # only needed for these rare containers
+        brand = head[8:12]
+        Image.init()
+        if brand == b"avif" and "AVIF" in Image.OPEN:
+            return "avif"
+        if brand in (b"heic", b"heix", b"heim", b"heis", b"mif1", b"msf1") and "HEIF" in Image.OPEN:
+            return "heif"
+    return None
+
+
+class Upload:
+    """
+    One received image: `data` is a memoryview of the in-memory body or an mmap of the spooled file,
+    `sha256` was computed while it streamed in. Call close() once decoding is done.
+    """
+
+    def __init__(self, filename: str, content_type: str, spool_bytes: int):
+        self.filename = filename
+        self.content_type = content_type
+        self.format: Optional[str] = None
+        self.size = 0
+        self.data: Optional["Buffer"] = None
+        self._hash = hashlib.sha256()
+        self._spool_bytes = spool_bytes
+        self._memory: Optional[io.BytesIO] = io.BytesIO()
+        self._file = None
+        self._head = b""
+
+    @property
+    def sha256(self) -> str:
+        return self._hash.hexdigest()
+
+    def write(self, chunk: bytes):
+        self._hash.update(chunk)
+        self.size += len(chunk)
+        if self.format is None and len(self._head) < _SNIFF_BYTES:
+            self._head += chunk[:_SNIFF_BYTES - len(self._head)]
+            if len(self._head) >= _SNIFF_BYTES:
+                self._sniff()
+        if self._file is None and self.size > self._spool_bytes:
+            self._file = tempfile.TemporaryFile(prefix="morph-upload-")
+            self._file.write(self._memory.getbuffer())
+            self._memory = None
+        (self._file or self._memory).write(chunk)
+
+    def _sniff(self):
+        self.format = sniff_image(self._head)
+        if self.format is None:
+            raise UploadError(415, "Unsupported image format. Please upload a JPEG, PNG, WebP, GIF, BMP or TIFF image.")
+
+    def finish(self):
+        if self.size == 0:
+            raise UploadError(400, "Empty upload.")
+        if self.format is None:
+            self._sniff()
+        if self._file is not None:
+            self._file.flush()
+            self.data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self.data = self._memory.getbuffer()
+
+    def close(self):
+        try:
+            if isinstance(self.data, memoryview):
+                self.data.release()
+            elif self.data is not None:
+                self.data.close()
+        except BufferError:
+            pass  # a decoder still holds a view (cancelled request); freed with its last reference
+        self.data = None
+        if self._file is not None:
+            self._file.close()
+        self._memory = None
+
+
+async def receive_upload(request, field: str = "file", max_bytes: int = MAX_UPLOAD_BYTES,
+                         spool_bytes: int = SPOOL_BYTES) -> Upload:
+    """
+    Streams the `field` file part of a multipart/form-data request, without buffering the body first.
+
+    The size limit is enforced as bytes arrive (and up front from Content-Length), and the image type is
+    sniffed from the first bytes, so oversized or non-image uploads are refused before the rest is read.
+    Other form fields are ignored. Raises UploadError.
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise UploadError(400, "Expected a multipart/form-data upload.")
+
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > max_bytes + _MULTIPART_OVERHEAD:
+        raise UploadError(413, f"Upload too large (limit {max_bytes // (1024 * 1024)} MB).")
+
+    upload: Optional[Upload] = None
+    state = {"headers": {}, "field": b"", "value": b"", "target": None, "done": False}
+
+    def on_part_begin():
+        state["headers"], state["target"] = {}, None
+
+    def on_header_field(data, start, end):
+        state["field"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        state["value"] += data[start:end]
+
+    def on_header_end():
+        state["headers"][state["field"].lower()] = state["value"]
+        state["field"] = state["value"] = b""
+
+    def on_headers_finished():
+        nonlocal upload
+        _, options = parse_options_header(state["headers"].get(b"content-disposition", b""))
+        if upload is not None or options.get(b"name", b"").decode("latin-1") != field:
+            return
+        part_type = state["headers"].get(b"content-type", b"").decode("latin-1")
+        if part_type and not part_type.startswith("image/") and part_type != "application/octet-stream":
+            raise UploadError(400, "Invalid file type. Please upload an image.")
+        filename = options.get(b"filename", b"").decode("utf-8", "replace")
+        upload = state["target"] = Upload(filename, part_type, spool_bytes)
+
+    def on_part_data(data, start, end):
+        target = state["target"]
+        if target is not None:
+            if target.size + (end - start) > max_bytes:
+                raise UploadError(413, f"Upload too large (limit {max_bytes // (1024 * 1024)} MB).")
+            target.write(data[start:end])
+
+    def on_part_end():
+        if state["target"] is not None:
+            state["target"], state["done"] = None, True
+
+    parser = MultipartParser(boundary, {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            if state["done"]:
+                break  # the image is complete; trailing form fields are not needed
+        if upload is None or not state["done"]:
+            raise UploadError(400, f"Missing '{field}' field in the upload.")
+        upload.finish()
+    except MultipartParseError as e:
+        if upload is not None:
+            upload.close()
+        raise UploadError(400, f"Malformed multipart upload: {e}") from None
+    except Exception:
+        if upload is not None:
+            upload.close()
+        raise
+    return upload
@@ -0,0 +1,4 @@
+# Bump whenever preprocessing, landmark handling or scoring changes the numbers for the same image.
+# Cached results are scoped by this string. It lives in its own module so the API process can read
+# it without importing MediaPipe.
+ENGINE_VERSION = "morphology-4"
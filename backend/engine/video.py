@@ -0,0 +1,215 @@
+import base64
+import itertools
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from engine.metrics import compute_metrics
+from engine.payload import mesh_to_text
+
+try:
+    import av  # optional: PyAV lets us decode keyframes only
+except ImportError:
+    av = None
+
+
+class Candidate(NamedTuple):
+    time: float          # seconds from the start of the clip
+    image: np.ndarray    # upright RGB, long edge <= the engine's max_side
+    size: Tuple[int, int]  # (w, h) of the full-resolution frame
+
+
+# Report fields summarized across the analyzed frames: response key -> compute_metrics column.
+AGGREGATE_FIELDS = {
+    "harmonyScore": "overall_score",
+    "symmetryScore": "s_symmetry",
+    "phiRatio": "phi_ratio",
+    "fWHR": "fwhr",
+    "canthalTilt": "avg_eye_tilt",
+    "jawToCheekRatio": "jaw_ratio",
+    "mouthNoseRatio": "mouth_nose_ratio",
+    "chinPhiltrumRatio": "chin_philtrum_ratio",
+}
+
+
+def _shrink(image: np.ndarray, max_side: int) -> np.ndarray:
+    h, w = image.shape[:2]
+    if max_side and max(w, h) > max_side:
+        scale = max_side / max(w, h)
+        return cv2.resize(image, (max(1, round(w * scale)), max(1, round(h * scale))), interpolation=cv2.INTER_AREA)
+    return image
+
+
+def _av_frames(path: str, keyframes_only: bool, stride: int = 1):
+    with av.open(path) as container:
+        stream = container.streams.video[0]
+        stream.thread_type = "AUTO"
+        if keyframes_only:
+            stream.codec_context.skip_frame = "NONKEY"
+        for i, frame in enumerate(container.decode(stream)):
+            if i % stride:
+                continue
+            image = frame.to_ndarray(format="rgb24")
+            # Phone clips carry their orientation as a display matrix (degrees counterclockwise).
+            k = (getattr(frame, "rotation", 0) or 0) // 90
+            if k % 4:
+                image = np.ascontiguousarray(np.rot90(image, k))
+            yield float(frame.time or 0.0), image
+
+
+def _cv2_frames(path: str, stride: int):
+    cap = cv2.VideoCapture(path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    i = 0
+    try:
+        # grab() demuxes and decodes, retrieve() (colour conversion + copy) only runs for kept frames.
+        while cap.grab():
+            if i % stride == 0:
+                ok, bgr = cap.retrieve()
+                if ok:
+                    yield i / fps, cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
+            i += 1
+    finally:
+        cap.release()
+
+
+def _frame_count(path: str) -> int:
+    cap = cv2.VideoCapture(path)
+    try:
+        return int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+    finally:
+        cap.release()
+
+
+def sample_frames(path: str, max_side: int, min_candidates: int = 12, max_candidates: int = 24) -> List[Candidate]:
+    """
+    Cheap candidate sampling: keyframes first (they decode without their neighbours), then, when a
+    clip has too few keyframes, an evenly strided pass over the whole stream.
+    Frames are shrunk to `max_side` right away so the candidate set stays small in memory.
+    """
+    decode_errors = (av.FFmpegError,) if av is not None else ()
+
+    def collect(frames, limit: Optional[int] = None) -> List[Candidate]:
+        # Decoding stops after `limit` frames, and close() releases the decoder right away.
+        try:
+            return [Candidate(t, _shrink(img, max_side), (img.shape[1], img.shape[0]))
+                    for t, img in itertools.islice(frames, limit)]
+        except decode_errors as e:
+            raise ValueError(f"Could not decode video: {e.strerror}") from None
+        finally:
+            frames.close()
+
+    candidates: List[Candidate] = []
+    if av is not None:
+        candidates = collect(_av_frames(path, keyframes_only=True))
+        if len(candidates) > max_candidates:
+            step = len(candidates) / max_candidates
+            candidates = [candidates[int(i * step)] for i in range(max_candidates)]
+
+    if len(candidates) < min_candidates:
+        stride = max(1, _frame_count(path) // max_candidates)
+        frames = _av_frames(path, False, stride) if av is not None else _cv2_frames(path, stride)
+        candidates = collect(frames, max_candidates * 2)
+    return candidates
+
+
+def sharpness(image: np.ndarray, side: int = 256) -> float:
+    """Variance of the Laplacian on a small grayscale thumbnail: higher is sharper."""
+    gray = cv2.cvtColor(_shrink(image, side), cv2.COLOR_RGB2GRAY)
+    return float(cv2.Laplacian(gray, cv2.CV_64F).var())
+
+
+def frontalness(landmarks: np.ndarray) -> float:
+    """
+    1.0 for a camera-facing head, falling towards 0 with yaw and pitch. Yaw shows as a depth gap between
+    the cheekbones and the nose tip drifting off the cheek midline; pitch as a brow-to-chin depth gap.
+    """
+    face_w = abs(landmarks[454, 0] - landmarks[234, 0]) or 1e-6
+    yaw = abs(landmarks[454, 2] - landmarks[234, 2]) / face_w
+    yaw += 2 * abs(landmarks[1, 0] - (landmarks[454, 0] + landmarks[234, 0]) / 2) / face_w
+    pitch = abs(landmarks[10, 2] - landmarks[152, 2]) / face_w
+    return float(np.exp(-4.0 * (yaw ** 2 + pitch ** 2)))
+
+
+def neutrality(blendshapes) -> float:
+    """1.0 for open eyes and a closed mouth; blinks and open mouths distort the measured proportions."""
+    if not blendshapes:
+        return 1.0
+    scores = {c.category_name: c.score for c in blendshapes}
+    worst = max(scores.get("eyeBlinkLeft", 0), scores.get("eyeBlinkRight", 0), scores.get("jawOpen", 0))
+    return float(1.0 - worst)
+
+
+def _summary(values: np.ndarray) -> Dict[str, float]:
+    return {
+        "mean": round(float(np.mean(values)), 3),
+        "std": round(float(np.std(values)), 3),
+        "min": round(float(np.min(values)), 3),
+        "max": round(float(np.max(values)), 3),
+    }
+
+
+def _data_url(image: np.ndarray, quality: int = 85) -> str:
+    ok, jpeg = cv2.imencode(".jpg", cv2.cvtColor(image, cv2.COLOR_RGB2BGR), [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return "data:image/jpeg;base64," + base64.b64encode(jpeg.tobytes()).decode("ascii")
+
+
+def analyze_video(engine, path: str, top_k: int = 3, prefilter_side: int = 480) -> Optional[Dict[str, Any]]:
+    """
+    Picks the best frames of a clip and analyzes only those.
+
+    1. sample keyframes (or a strided subset) as candidates;
+    2. rank by blur on tiny thumbnails, keep the sharpest 3 * top_k;
+    3. run the landmarker on `prefilter_side` copies of those to rate pose (landmark z) and expression
+       (blendshapes);
+    4. fully analyze the top_k by sharpness x frontalness x neutrality.
+    Returns the best frame's report (its mesh under "mesh", see engine.payload) plus aggregate
+    statistics, or None when no frame has a face.
+    """
+    candidates = sample_frames(path, engine.max_side)
+    if not candidates:
+        raise ValueError("Could not decode any frames from the video")
+
+    blur = np.array([sharpness(c.image) for c in candidates])
+    shortlist = np.argsort(-blur)[:top_k * 3]
+    top_sharpness = blur.max() or 1.0
+
+    rated = []
+    for i in shortlist:
+        result = engine.detect(_shrink(candidates[i].image, prefilter_side))
+        if not result.face_landmarks:
+            continue
+        landmarks = np.array([(lm.x, lm.y, lm.z) for lm in result.face_landmarks[0]], dtype=np.float32)
+        front = frontalness(landmarks)
+        neutral = neutrality(result.face_blendshapes[0] if result.face_blendshapes else None)
+        quality = np.sqrt(blur[i] / top_sharpness) * front * neutral
+        rated.append((quality, int(i), front, neutral))
+    rated.sort(reverse=True)
+
+    analyzed = []
+    for quality, i, front, neutral in rated[:top_k]:
+        analysis = engine.analyze_frame(candidates[i].image, candidates[i].size)
+        if analysis is not None:
+            analyzed.append((analysis, {
+                "index": i,
+                "time": round(candidates[i].time, 3),
+                "sharpness": round(float(blur[i]), 1),
+                "frontalness": round(front, 3),
+                "neutrality": round(neutral, 3),
+                "quality": round(float(quality), 3),
+            }))
+    if not analyzed:
+        return None
+
+    best, best_frame = analyzed[0]
+    m = compute_metrics(np.stack([a.landmarks for a, _ in analyzed]), np.array([a.size for a, _ in analyzed]))
+    return {
+        "analysis": best.report,
+        "mesh": mesh_to_text(best.landmarks),  # rendered into analysis.landmarks by the API
+        "frame": best_frame,
+        "frames": [info for _, info in analyzed],
+        "aggregate": {key: _summary(m[column]) for key, column in AGGREGATE_FIELDS.items()},
+        "candidates": {"sampled": len(candidates), "prefiltered": len(shortlist), "faces": len(rated), "analyzed": len(analyzed)},
+        "image": _data_url(candidates[best_frame["index"]].image),
+    }
@@ -1,14 +1,252 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+import time
+_BOOT = time.perf_counter()  # process start, for time-to-ready
+
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from engine.morphology import MorphologyEngine
-import uvicorn
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from contextlib import asynccontextmanager
+from engine.pool import BULK, INTERACTIVE, EnginePool, PoolSaturated
+from engine.jobs import TERMINAL, JobRunner, JobStore
+from engine.cache import ResultCache
+from engine.decode import DecodeError
+from engine.landmark_store import LandmarkStore
+from engine.population import TRAITS, PopulationStats
+from engine.similarity import SimilarityIndex, face_vectors
+from engine.aggregate import aggregate_shots
+from engine.metrics import build_report, compute_metrics, score_profiles
+from engine.profiles import PROFILES, ProfileError, summarize
+from engine.payload import dumps, encode_landmarks, mesh_from_text, mesh_to_text, wants_msgpack
+from engine.quality import QualityRejected
+from engine.uploads import UploadError, receive_upload
+from engine.telemetry import REQUEST_SECONDS, STAGE_SECONDS, gauge, stage
+from engine.version import ENGINE_VERSION
+import asyncio
+import logging
 import os
-import sys
 import io
 import base64
-from PIL import Image, ImageDraw
+import tempfile
+import threading
+import zipfile
+from typing import List, Literal, Optional
+
+# Logging: MORPH_LOG_LEVEL=DEBUG adds the per-face score breakdown to the log.
+logging.basicConfig(level=os.environ.get("MORPH_LOG_LEVEL", "INFO").upper(),
+                    format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logger = logging.getLogger("morphology")
+
+# Engine Pool (one MorphologyEngine per worker)
+# MORPH_ENGINE_MODE: "thread" (default) runs engines on threads in this process,
+# "process" runs them in dedicated inference processes fed through shared memory.
+# MORPH_POOL_SIZE defaults to the CPU count, MORPH_POOL_QUEUE to 4 waiting requests per worker.
+# MediaPipe, OpenCV and PIL are only imported by the pool, so the server answers /health/live
+# right away while engines load and warm up in the background; /health/ready flips once they are done.
+engine_pool = None
+startup_seconds = None  # process start -> first pool ready
+reload_lock = asyncio.Lock()
+
+def create_engine_pool() -> EnginePool:
+    size = int(os.environ.get("MORPH_POOL_SIZE", 0)) or None
+    max_queue = int(os.environ["MORPH_POOL_QUEUE"]) if "MORPH_POOL_QUEUE" in os.environ else None
+    if os.environ.get("MORPH_ENGINE_MODE", "thread") == "process":
+        from engine.procpool import ProcessEnginePool
+        return ProcessEnginePool(size=size, max_queue=max_queue)
+    return EnginePool(size=size, max_queue=max_queue)
+
+def current_pool() -> EnginePool:
+    """The live engine pool; 503 with Retry-After while the first one is still warming up."""
+    if engine_pool is None:
+        raise HTTPException(status_code=503, detail="Engine is starting. Please retry shortly.",
+                            headers={"Retry-After": "2"})
+    return engine_pool
+
+async def load_engines():
+    """
+    Builds a new pool of warmed engines off the event loop, then swaps it in. Requests already queued
+    on the old pool finish there before its engines are closed, so nothing in flight is dropped.
+    """
+    global engine_pool, startup_seconds
+    async with reload_lock:
+        start = time.perf_counter()
+        pool = await asyncio.to_thread(create_engine_pool)
+        old, engine_pool = engine_pool, pool
+        if startup_seconds is None:
+            startup_seconds = time.perf_counter() - _BOOT
+            logger.info("Engines ready in %.2fs after process start", startup_seconds)
+        else:
+            logger.info("Engines reloaded in %.2fs", time.perf_counter() - start)
+    if old is not None:
+        await asyncio.to_thread(old.shutdown)
+    return time.perf_counter() - start
+
+def _log_startup_failure(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Engine startup failed", exc_info=task.exception())
+
+# Background jobs: a durable SQLite queue under MORPH_JOB_DIR (default backend/jobs), drained onto
+# the engine pool at BULK priority. Finished jobs are kept for MORPH_JOB_TTL seconds.
+job_store = None
+job_runner = None
+
+@asynccontextmanager
+async def lifespan(app):
+    # Built here rather than at import time: spawned inference processes re-import this module.
+    global job_store, job_runner
+    loading = asyncio.create_task(load_engines())
+    loading.add_done_callback(_log_startup_failure)
+    job_store = JobStore(os.environ.get("MORPH_JOB_DIR") or os.path.join(os.path.dirname(os.path.abspath(__file__)), "jobs"),
+                         ENGINE_VERSION, ttl=float(os.environ.get("MORPH_JOB_TTL", 7 * 86400)))
+    job_runner = JobRunner(job_store, execute_job, lambda: engine_pool.size if engine_pool is not None else 0)
+    draining = asyncio.create_task(job_runner.run())
+    statistics = asyncio.create_task(maintain_population())
+    indexing = asyncio.create_task(maintain_similarity())
+    yield
+    loading.cancel()
+    draining.cancel()
+    statistics.cancel()
+    indexing.cancel()
+    if engine_pool is not None:
+        engine_pool.shutdown()
+    job_store.close()
+
+app = FastAPI(title="Morphology Scout API", lifespan=lifespan)
+
+# Result Cache (content-addressed by image hash + engine version)
+# MORPH_CACHE_SIZE entries (0 disables the memory tier) kept for MORPH_CACHE_TTL seconds;
+# MORPH_CACHE_DIR enables the on-disk tier, which survives /restart.
+result_cache = ResultCache(
+    version=ENGINE_VERSION,
+    max_entries=int(os.environ.get("MORPH_CACHE_SIZE", 1024)),
+    ttl=float(os.environ.get("MORPH_CACHE_TTL", 3600)),
+    directory=os.environ.get("MORPH_CACHE_DIR") or None,
+)
+
+# Landmark Store: MORPH_LANDMARK_DIR persists every analyzed face mesh by image hash, so the
+# archive can be re-scored offline with `python -m engine.rescore` when the formula changes.
+landmark_store = LandmarkStore(os.environ["MORPH_LANDMARK_DIR"]) if os.environ.get("MORPH_LANDMARK_DIR") else None
+
+# Population Stats: streaming per-trait distributions of every analyzed face, for percentile and rarity
+# lookups. Saved to MORPH_STATS_PATH (default population.json in MORPH_LANDMARK_DIR, if set); archived
+# faces it does not cover yet are replayed into it at startup.
+_stats_path = os.environ.get("MORPH_STATS_PATH") or (
+    os.path.join(os.environ["MORPH_LANDMARK_DIR"], "population.json") if landmark_store is not None else None)
+population = PopulationStats(ENGINE_VERSION, _stats_path)
+
+# Similarity Index: every analyzed face as a feature vector, for /similar. Kept in memory and rebuilt
+# from the landmark archive at startup; exact search below MORPH_SIMILAR_IVF_MIN faces, IVF above.
+similarity = SimilarityIndex()
+
+# Held while a face goes into the archive, the population and the similarity index together, so the
+# startup replays can tell exactly which faces the live instances already hold.
+_record_lock = threading.Lock()
+
+def _record_analysis(key: str, analysis):
+    # Cache entries hold the report and the mesh (base64 float32), so hits can be rendered in any
+    # landmark format without keeping 500 point dicts per entry.
+    result_cache.put(key, {"analysis": analysis.report, "mesh": mesh_to_text(analysis.landmarks),
+                           "size": list(analysis.size)})
+    # The archive dedupes by image hash, so an image re-analyzed after its cache entry expired is
+    # only counted once in the population.
+    with _record_lock:
+        if landmark_store is None or landmark_store.add(key, analysis.landmarks, analysis.size):
+            population.add(analysis.landmarks, analysis.size)
+        similarity.add(key, analysis.landmarks, analysis.size)
 
-app = FastAPI(title="Morphology Scout API")
+async def maintain_population(interval: float = 60.0):
+    """
+    Replays the archived faces the saved statistics do not cover yet (all of them when there is no
+    saved state, the tail archived after the last save after a crash), then saves every `interval` seconds.
+    """
+    # Archive inserts and population adds happen together under _record_lock, so the statistics
+    # always cover a prefix of the archive: rows [0, faces). Faces recorded from here on land past
+    # `rows` and go into the live statistics directly.
+    with _record_lock:
+        start = population.faces
+        rows = len(landmark_store) if landmark_store is not None else 0
+    if rows > start:
+        tail = await asyncio.to_thread(PopulationStats.from_store, landmark_store, ENGINE_VERSION,
+                                       start=start, rows=rows)
+        await asyncio.to_thread(population.merge, tail)
+        logger.info("Population statistics caught up on %d archived faces", rows - start)
+    saved = None
+    try:
+        while True:
+            if population.count != saved:
+                saved = population.count
+                await asyncio.to_thread(population.save)
+            await asyncio.sleep(interval)
+    finally:
+        population.save()
+
+def _adopt_similarity(rebuilt: SimilarityIndex):
+    global similarity
+    # Faces analyzed during the build went into the old index; carry them over, with no face recorded
+    # between the merge and the swap.
+    with _record_lock:
+        rebuilt.merge(similarity)
+        similarity = rebuilt
+
+async def maintain_similarity(interval: float = 60.0):
+    """Indexes the landmark archive at startup, then retrains the IVF lists as the index grows."""
+    with _record_lock:
+        rows = len(landmark_store) if landmark_store is not None else 0
+    if rows:
+        rebuilt = await asyncio.to_thread(SimilarityIndex.from_store, landmark_store, rows=rows)
+        await asyncio.to_thread(_adopt_similarity, rebuilt)
+        logger.info("Similarity index built from %d archived faces", rows)
+    while True:
+        await asyncio.sleep(interval)
+        await asyncio.to_thread(similarity.maybe_train)
+
+async def run_analysis(contents, wait: bool = False, key: Optional[str] = None, priority: int = INTERACTIVE):
+    """
+    Returns (report, mesh, size) for an image, from the cache when these exact bytes were seen before;
+    None when no face is found. `key` is the image's cache key when the caller already hashed it
+    (streamed uploads). Render the mesh into the response with render_analysis().
+    """
+    if key is None:
+        key = await asyncio.to_thread(result_cache.key, contents)
+    cached = result_cache.get(key)
+    if cached is not None and "size" in cached:  # entries from before meshes and sizes were cached are recomputed
+        return cached["analysis"], mesh_from_text(cached["mesh"]), tuple(cached["size"])
+    analysis = await current_pool().call("analyze", contents, wait=wait, priority=priority)
+    if analysis is None:
+        return None
+    if analysis.timings:
+        STAGE_SECONDS.observe_all(analysis.timings)
+    await asyncio.to_thread(_record_analysis, key, analysis)
+    return analysis.report, analysis.landmarks, analysis.size
+
+LandmarkMode = Literal["full", "named", "none"]
+LandmarkEncoding = Literal["json", "f32", "f16", "i16"]
+
+def render_analysis(report: dict, mesh, landmarks: str = "full", encoding: str = "json", binary: bool = False) -> dict:
+    """The response "analysis" object: the report plus landmarks in the requested form (see engine.payload)."""
+    rendered = encode_landmarks(mesh, landmarks, encoding, binary) if mesh is not None else None
+    return dict(report, landmarks=rendered) if rendered is not None else report
+
+def profile_names(profiles: Optional[str]) -> List[str]:
+    """?profiles= as a list of known profile names: comma-separated, or "all"; 422 on unknown names."""
+    if not profiles:
+        return []
+    names = PROFILES.names if profiles == "all" else list(dict.fromkeys(n.strip() for n in profiles.split(",") if n.strip()))
+    try:
+        PROFILES.select(names)
+    except ProfileError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return names
+
+def respond(request: Request, build) -> Response:
+    """
+    Serializes `build(binary)` as MessagePack when the client accepts it (binary=True leaves packed
+    landmarks as raw bytes), else as JSON through the fastest available encoder.
+    """
+    use_msgpack = wants_msgpack(request.headers.get("accept"))
+    timings = {}
+    with stage(timings, "encode"):
+        content = dumps(build(use_msgpack), use_msgpack)
+    STAGE_SECONDS.observe_all(timings)
+    return Response(content, media_type="application/msgpack" if use_msgpack else "application/json")
 
 # ... (CORS middleware same as before)
 app.add_middleware(
@@ -19,88 +257,791 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize Engine (Singleton-ish)
-morphology_engine = MorphologyEngine()
+@app.middleware("http")
+async def time_requests(request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    # Label by route template, not raw path, so series stay bounded. Streaming responses are
+    # timed to their first byte.
+    route = request.scope.get("route")
+    if route is not None:
+        REQUEST_SECONDS.observe(time.perf_counter() - start, route.path, str(response.status_code))
+    return response
 
 @app.get("/")
 def read_root():
     return {"status": "online", "service": "Morphology Scout Engine"}
 
+@app.get("/cache/stats")
+def cache_stats():
+    return result_cache.stats()
+
+@app.get("/health/live")
+def health_live():
+    """Liveness: the process is up and serving HTTP (engines may still be loading)."""
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+def health_ready():
+    """Readiness: warmed engines are accepting analysis requests."""
+    if engine_pool is None:
+        return JSONResponse({"status": "starting"}, status_code=503, headers={"Retry-After": "2"})
+    return {"status": "ready", "engineVersion": ENGINE_VERSION, "workers": engine_pool.size,
+            "startupSeconds": round(startup_seconds, 3)}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus text exposition: stage and request latency histograms plus pool and cache gauges."""
+    cache = result_cache.stats()
+    lines = STAGE_SECONDS.render() + REQUEST_SECONDS.render()
+    lines += gauge("morph_ready", "1 once warmed engines are serving requests.", int(engine_pool is not None))
+    if engine_pool is not None:
+        lines += gauge("morph_startup_seconds", "Process start to first engine pool ready.", startup_seconds)
+        lines += gauge("morph_pool_size", "Analysis workers.", engine_pool.size)
+        lines += gauge("morph_pool_queue_depth", "Requests waiting for a worker.", engine_pool.queue_depth)
+        lines += gauge("morph_pool_busy", "Workers currently analyzing.", engine_pool.busy)
+        lines += gauge("morph_pool_utilization", "Fraction of workers currently busy.", engine_pool.busy / engine_pool.size)
+    jobs = job_store.counts()
+    lines += gauge("morph_jobs_queued", "Background jobs waiting to run.", jobs.get("queued", 0))
+    lines += gauge("morph_jobs_running", "Background jobs being analyzed.", jobs.get("running", 0))
+    lines += gauge("morph_population_faces", "Faces in the population statistics.", population.count)
+    lines += gauge("morph_similarity_faces", "Faces in the similarity index.", len(similarity))
+    lines += gauge("morph_cache_entries", "Results held in the memory cache.", cache["entries"])
+    lines += gauge("morph_cache_hits_total", "Cache hits (memory and disk).", cache["hits"] + cache["diskHits"], "counter")
+    lines += gauge("morph_cache_misses_total", "Cache misses.", cache["misses"], "counter")
+    lines += gauge("morph_cache_hit_rate", "Cache hits over lookups since start.", cache["hitRate"])
+    return PlainTextResponse("\n".join(lines) + "\n", media_type="text/plain; version=0.0.4")
+
 @app.post("/restart")
-def restart_engine():
+async def restart_engine():
     """
-    Restarts the backend process.
+    Reloads the analysis engines in place: a new pool is built and warmed while the current one keeps
+    serving, then swapped in. The server stays up and in-flight requests complete on the old engines.
     """
-    print("🔄 Restarting Morphology Engine...")
-    os.execv(sys.executable, ['python3'] + sys.argv)
+    if engine_pool is None:
+        raise HTTPException(status_code=409, detail="Engine is still starting.")
+    if reload_lock.locked():
+        raise HTTPException(status_code=409, detail="A reload is already in progress.")
+    logger.info("Reloading Morphology Engine...")
+    seconds = await load_engines()
+    return {"status": "reloaded", "seconds": round(seconds, 3)}
 
-@app.post("/analyze")
-async def analyze_face(file: UploadFile = File(...)):
-    if not file.content_type.startswith('image/'):
-        raise HTTPException(status_code=400, detail="Invalid file type. Please upload an image.")
-    
+def _trait(name: str) -> str:
+    if name not in TRAITS:
+        raise HTTPException(status_code=422, detail=f"Unknown trait '{name}'. Known traits: {', '.join(TRAITS)}.")
+    return name
+
+@app.get("/population")
+def population_summary():
+    """Count, mean, std, extremes and quantiles of every trait over all analyzed faces."""
+    return population.summary()
+
+@app.get("/population/percentile")
+def population_percentile(trait: str, value: float):
+    """Percentile, z-score and rarity (1-10) of one trait value within the analyzed population."""
+    return population.percentile(_trait(trait), value)
+
+@app.get("/population/rarity")
+def population_rarity(request: Request):
+    """
+    Rarity of a face from its trait values, passed as query parameters named like the report fields
+    (e.g. ?fWHR=1.82&canthalTilt=4.1): per-trait percentiles plus the mean rarity score and label.
+    """
+    values = {}
+    for name, raw in request.query_params.items():
+        try:
+            values[_trait(name)] = float(raw)
+        except ValueError:
+            raise HTTPException(status_code=422, detail=f"Trait '{name}' needs a numeric value.")
+    if not values:
+        raise HTTPException(status_code=422, detail="Pass at least one trait value.")
+    return population.rarity(values)
+
+@app.get("/profiles")
+def list_profiles():
+    """Every scoring profile as configured: description, weighted terms with their curves, bonuses, verdicts."""
+    return PROFILES.specs
+
+@app.get("/profiles/score")
+def score_measurements(request: Request, profiles: str = "all"):
+    """
+    Scores raw measurements (query parameters named like the metric columns a profile's terms read,
+    e.g. ?fwhr=1.82&avg_eye_tilt=4.1) with the given profiles. Terms without a value are left out and
+    the remaining weights renormalized, so a market can be scored from the traits at hand.
+    """
+    names = profile_names(profiles)
+    known = set(PROFILES.measures)
+    values = {}
+    for name, raw in request.query_params.items():
+        if name == "profiles":
+            continue
+        if name not in known:
+            raise HTTPException(status_code=422, detail=f"Unknown measurement '{name}'. Known: {', '.join(sorted(known))}.")
+        try:
+            values[name] = [float(raw)]
+        except ValueError:
+            raise HTTPException(status_code=422, detail=f"Measurement '{name}' needs a numeric value.")
+    if not values:
+        raise HTTPException(status_code=422, detail="Pass at least one measurement.")
+    return summarize(PROFILES.select(names).evaluate(values), 0, PROFILES.specs)
+
+# The upload is parsed by hand (engine.uploads) so it can be size-checked and sniffed while it streams;
+# this schema keeps the `file` field documented in the OpenAPI spec.
+_IMAGE_UPLOAD_SCHEMA = {"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": {
+    "type": "object", "required": ["file"], "properties": {"file": {"type": "string", "format": "binary"}},
+}}}}}
+
+@app.post("/analyze", openapi_extra=_IMAGE_UPLOAD_SCHEMA)
+async def analyze_face(request: Request, landmarks: LandmarkMode = "full", encoding: LandmarkEncoding = "json",
+                       profiles: Optional[str] = None):
+    """
+    Scores one image. Unusable inputs (blurry, badly exposed, tiny, turned away) are refused early with
+    a 422 whose detail carries a machine-readable `reason` and the `quality` measurements; otherwise
+    those measurements and any warnings come back under `analysis.quality`. `landmarks` picks every point (478 mesh + 22 forehead), only the named points,
+    or none; `encoding` returns them as {"x","y","z"} dicts or as a packed f32/f16/i16 array
+    ({"encoding", "shape", "data", ["scale"]}, base64). Send `Accept: application/msgpack` for a
+    MessagePack body, where packed arrays are raw bytes. `profiles` (comma-separated names or "all",
+    see GET /profiles) adds `analysis.profiles` with each scoring profile's score, terms and verdict.
+    """
+    names = profile_names(profiles)
+    upload = None
     try:
-        contents = await file.read()
+        timings = {}
+        with stage(timings, "read"):
+            upload = await receive_upload(request)
+        STAGE_SECONDS.observe_all(timings)
         
-        # Morphology (Feature-centric analysis)
-        morphology_data = morphology_engine.process_image(contents)
+        # Morphology (Feature-centric analysis), run on the engine pool off the event loop
+        morphology_data = await run_analysis(upload.data, key=upload.sha256)
         
         if not morphology_data:
              raise HTTPException(status_code=422, detail="No face detected or image unclear.")
              
-        return {
-            "analysis": morphology_data
-        }
+        report, mesh, size = morphology_data
+        if names:
+            report = dict(report, profiles=(await asyncio.to_thread(score_profiles, mesh, size, names))[0])
+        return respond(request, lambda binary: {
+            "analysis": render_analysis(report, mesh, landmarks, encoding, binary)
+        })
+
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except DecodeError as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    except QualityRejected as e:
+        raise HTTPException(status_code=422, detail=e.detail())
+    except PoolSaturated as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Analysis queue is full. Please retry shortly.",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("Error processing image: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if upload is not None:
+            upload.close()
+
+@app.post("/analyze/faces", openapi_extra=_IMAGE_UPLOAD_SCHEMA)
+async def analyze_faces(request: Request, max_faces: int = 10, refine: bool = True,
+                        landmarks: LandmarkMode = "full", encoding: LandmarkEncoding = "json",
+                        profiles: Optional[str] = None):
+    """
+    Scores every face in a group shot or contact sheet in one request. Each entry of `faces` (left to
+    right) carries its normalized bounding `box` and an `analysis` shaped like /analyze, with the same
+    landmark and profile options. `refine` re-detects small faces on upscaled crops instead of the whole image.
+    """
+    from engine.faces import MAX_FACES
+    names = profile_names(profiles)
+    if not 1 <= max_faces <= MAX_FACES:
+        raise HTTPException(status_code=422, detail=f"max_faces must be between 1 and {MAX_FACES}.")
+    upload = None
+    try:
+        timings = {}
+        with stage(timings, "read"):
+            upload = await receive_upload(request)
+        STAGE_SECONDS.observe_all(timings)
+
+        key = f"{upload.sha256}-faces{max_faces}{'r' if refine else ''}"  # apart from single-face results
+        result = result_cache.get(key)
+        if result is None:
+            result = await current_pool().call("analyze_faces", upload.data, max_faces, refine)
+            if result is None:
+                raise HTTPException(status_code=422, detail="No face detected or image unclear.")
+            STAGE_SECONDS.observe_all(result.pop("timings"))
+            result_cache.put(key, result)
+
+        faces = [(face, mesh_from_text(face["mesh"])) for face in result["faces"]]
+        if names:
+            scores = await asyncio.to_thread(score_profiles, [mesh for _, mesh in faces], tuple(result["size"]), names)
+            faces = [(dict(face, analysis=dict(face["analysis"], profiles=s)), mesh) for (face, mesh), s in zip(faces, scores)]
+        return respond(request, lambda binary: {
+            "size": result["size"],
+            "count": len(faces),
+            "faces": [
+                {"index": face["index"], "box": face["box"], "refined": face["refined"],
+                 "analysis": render_analysis(face["analysis"], mesh, landmarks, encoding, binary)}
+                for face, mesh in faces
+            ],
+        })
+
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except DecodeError as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    except QualityRejected as e:
+        raise HTTPException(status_code=422, detail=e.detail())
+    except PoolSaturated as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Analysis queue is full. Please retry shortly.",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("Error processing image: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if upload is not None:
+            upload.close()
+
+# Most matches /similar returns per query.
+MAX_SIMILAR = 100
+
+def _stored_face(key: str):
+    """(mesh, size) of an analyzed image from the landmark archive or the cache, without inference; else None."""
+    stored = landmark_store.get(key) if landmark_store is not None else None
+    if stored is None:
+        cached = result_cache.get(key)
+        if cached is not None and "size" in cached:
+            stored = mesh_from_text(cached["mesh"]), tuple(cached["size"])
+    return stored
+
+def _face_vector(key: str):
+    """The feature vector of an analyzed image: from the index, else from its stored mesh."""
+    vector = similarity.vector(key)
+    if vector is not None:
+        return vector
+    stored = _stored_face(key)
+    return face_vectors(*stored)[0] if stored is not None else None
+
+def _match_report(key: str) -> Optional[dict]:
+    cached = result_cache.get(key)
+    if cached is not None:
+        return cached["analysis"]
+    stored = landmark_store.get(key) if landmark_store is not None else None
+    return build_report(compute_metrics(*stored)) if stored is not None else None
+
+def _similar(key: str, vector, k: int, reports: bool) -> dict:
+    timings = {}
+    with stage(timings, "search"):
+        found = similarity.search(vector, k, exclude=key)
+    STAGE_SECONDS.observe_all(timings)
+    if reports:
+        for match in found["matches"]:
+            match["analysis"] = _match_report(match["key"])
+    return dict(found, query=key, count=len(similarity), ms=round(timings["search"] * 1000, 3))
+
+def _check_k(k: int):
+    if not 1 <= k <= MAX_SIMILAR:
+        raise HTTPException(status_code=422, detail=f"k must be between 1 and {MAX_SIMILAR}.")
+
+@app.get("/similar/{key}")
+async def similar_to_key(key: str, k: int = 10, reports: bool = False):
+    """
+    The `k` analyzed faces closest to an already-analyzed image, given by its SHA-256. Matches come
+    nearest first with their image hash and distance (and their report with `reports`).
+    """
+    _check_k(k)
+    vector = await asyncio.to_thread(_face_vector, key)
+    if vector is None:
+        raise HTTPException(status_code=404, detail="No analyzed face for this image.")
+    return await asyncio.to_thread(_similar, key, vector, k, reports)
+
+@app.post("/similar", openapi_extra=_IMAGE_UPLOAD_SCHEMA)
+async def similar_to_image(request: Request, k: int = 10, reports: bool = False):
+    """
+    Analyzes an upload like /analyze (and indexes it), then returns the `k` closest other faces, as
+    GET /similar/{key} does.
+    """
+    _check_k(k)
+    upload = None
+    try:
+        upload = await receive_upload(request)
+        if not await run_analysis(upload.data, key=upload.sha256):
+            raise HTTPException(status_code=422, detail="No face detected or image unclear.")
+        vector = await asyncio.to_thread(_face_vector, upload.sha256)
+        if vector is None:
+            raise HTTPException(status_code=422, detail="No face detected or image unclear.")
+        return await asyncio.to_thread(_similar, upload.sha256, vector, k, reports)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except DecodeError as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    except QualityRejected as e:
+        raise HTTPException(status_code=422, detail=e.detail())
+    except PoolSaturated as e:
+        raise HTTPException(status_code=503, detail="Analysis queue is full. Please retry shortly.",
+                            headers={"Retry-After": str(e.retry_after)})
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("Error processing image: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if upload is not None:
+            upload.close()
+
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.m4v', '.webm', '.mkv', '.avi')
+
+def _is_video(file: UploadFile) -> bool:
+    return (file.content_type or "").startswith('video/') or (file.filename or "").lower().endswith(VIDEO_EXTENSIONS)
+
+def _video_key(hasher, top_k: int) -> str:
+    hasher.update(b"\0video:%d" % top_k)  # keeps clip results apart from image results
+    return hasher.hexdigest()
+
+async def run_video(path: str, top_k: int, key: str, priority: int = INTERACTIVE):
+    """The best-frame result for a clip on disk (cached under `key`), or None when no frame has a face."""
+    result = result_cache.get(key)
+    if result is None:
+        result = await current_pool().call("analyze_video", path, top_k, wait=priority != INTERACTIVE,
+                                           priority=priority)
+        if result is None:
+            return None
+        result_cache.put(key, result)
+    return result
+
+def render_video(result: dict, landmarks: str = "full", encoding: str = "json", binary: bool = False) -> dict:
+    body = {k: v for k, v in result.items() if k != "mesh"}
+    mesh = mesh_from_text(result["mesh"]) if "mesh" in result else None
+    body["analysis"] = render_analysis(result["analysis"], mesh, landmarks, encoding, binary)
+    return body
 
+@app.post("/analyze/video")
+async def analyze_video(request: Request, file: UploadFile = File(...), top_k: int = 3,
+                        landmarks: LandmarkMode = "full", encoding: LandmarkEncoding = "json"):
+    """
+    Scores a short clip instead of a single photo: the sharpest, most frontal, most neutral frames are
+    picked cheaply and only those run through the full analysis. The response carries the best frame's
+    analysis (same shape as /analyze, same landmark options), that frame as a JPEG data URL, and
+    statistics over the top frames.
+    """
+    filename = file.filename or ""
+    if not _is_video(file):
+        raise HTTPException(status_code=400, detail="Invalid file type. Please upload a video.")
+
+    # The decoders need a seekable file, so the upload is spooled to disk (the same path is shared
+    # with inference processes in process mode) and hashed on the way for the result cache.
+    hasher = result_cache.hasher()
+    fd, path = tempfile.mkstemp(suffix=os.path.splitext(filename)[1] or ".mp4")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while chunk := await file.read(1 << 20):
+                hasher.update(chunk)
+                out.write(chunk)
+        result = await run_video(path, top_k, _video_key(hasher, top_k))
+        if result is None:
+            raise HTTPException(status_code=422, detail="No face detected in any frame of the video.")
+        return respond(request, lambda binary: render_video(result, landmarks, encoding, binary))
+
+    except PoolSaturated as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Analysis queue is full. Please retry shortly.",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
-        print(f"Error processing image: {e}")
+        logger.exception("Error processing video: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        os.unlink(path)
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.bmp', '.tif', '.tiff', '.heic')
+
+def _iter_batch_items(files: List[UploadFile]):
+    """
+    Yields (filename, bytes) for every uploaded image, expanding zip archives entry by entry.
+    An archive that cannot be read yields (filename, exception) so the rest of the batch still runs.
+    """
+    for f in files:
+        name = f.filename or ""
+        if f.content_type in ('application/zip', 'application/x-zip-compressed') or name.lower().endswith('.zip'):
+            try:
+                with zipfile.ZipFile(f.file) as archive:
+                    for info in archive.infolist():
+                        if not info.is_dir() and info.filename.lower().endswith(IMAGE_EXTENSIONS):
+                            yield info.filename, archive.read(info)
+            except zipfile.BadZipFile as e:
+                yield name, e
+        else:
+            yield name, f.file.read()
+
+async def _analyze_batch_item(index: int, filename: str, contents: bytes, landmarks: str, encoding: str,
+                              names: List[str]) -> dict:
+    item = {"index": index, "filename": filename}
+    try:
+        # wait=True: the batch bounds its own concurrency, so it queues (behind interactive requests)
+        # instead of getting a 503.
+        morphology_data = await run_analysis(contents, wait=True, priority=BULK)
+        if not morphology_data:
+            item.update(status=422, error="No face detected or image unclear.")
+        else:
+            report, mesh, size = morphology_data
+            if names:
+                report = dict(report, profiles=(await asyncio.to_thread(score_profiles, mesh, size, names))[0])
+            item.update(status=200, analysis=render_analysis(report, mesh, landmarks, encoding))
+    except QualityRejected as e:
+        detail = e.detail()
+        item.update(status=422, error=detail["message"], reason=detail["reason"], quality=detail["quality"])
+    except DecodeError as e:
+        # Same status /analyze answers for an image it cannot decode.
+        item.update(status=415, error=str(e))
+    except Exception as e:
+        logger.exception("Error processing batch item %s: %s", filename, e)
+        item.update(status=500, error=str(e))
+    return item
+
+@app.post("/analyze/batch")
+async def analyze_batch(files: List[UploadFile] = File(...), landmarks: LandmarkMode = "full",
+                        encoding: LandmarkEncoding = "json", profiles: Optional[str] = None):
+    """
+    Scores many images (or zip archives of images) in one request.
+    Results stream back as NDJSON, one line per image in completion order, followed by a summary line.
+    `landmarks`, `encoding` and `profiles` work as on /analyze.
+    """
+    names = profile_names(profiles)
+    pool_size = current_pool().size
+
+    async def stream():
+        items = _iter_batch_items(files)
+        in_flight = set()
+        max_in_flight = pool_size * 2  # keep every worker fed without reading the whole batch into memory
+        count = errors = 0
+        exhausted = False
+
+        try:
+            while not exhausted or in_flight:
+                while not exhausted and len(in_flight) < max_in_flight:
+                    item = await asyncio.to_thread(next, items, None)
+                    if item is None:
+                        exhausted = True
+                        break
+                    filename, contents = item
+                    if isinstance(contents, Exception):
+                        errors += 1
+                        yield dumps({"index": count, "filename": filename, "status": 400, "error": str(contents)}) + b"\n"
+                    else:
+                        in_flight.add(asyncio.ensure_future(_analyze_batch_item(count, filename, contents, landmarks, encoding, names)))
+                    count += 1
+
+                if not in_flight:
+                    continue
+                done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    result = task.result()
+                    if result["status"] != 200:
+                        errors += 1
+                    yield dumps(result) + b"\n"
+        finally:
+            # Client went away mid-stream: don't keep the pool busy with results nobody will read.
+            for task in in_flight:
+                task.cancel()
+
+        yield dumps({"done": True, "count": count, "errors": errors}) + b"\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+# Subjects: several shots of one person scored together (engine.aggregate). Shots are given as uploads
+# and/or as hashes of images analyzed before, so a client grows a subject without re-sending photos.
+MAX_SHOTS = 32
+
+async def _subject_shot(index: int, filename: str, contents: bytes) -> dict:
+    """Mesh and size of one uploaded shot: reused when the image was analyzed before, else inferred once."""
+    item = {"index": index, "filename": filename}
+    if isinstance(contents, Exception):  # unreadable archive
+        item.update(status=400, error=str(contents))
+        return item
+    try:
+        item["key"] = key = await asyncio.to_thread(result_cache.key, contents)
+        face = await asyncio.to_thread(_stored_face, key)
+        if face is None:
+            analysis = await current_pool().call("analyze", contents, wait=True, priority=BULK)
+            if analysis is None:
+                item.update(status=422, error="No face detected or image unclear.")
+                return item
+            if analysis.timings:
+                STAGE_SECONDS.observe_all(analysis.timings)
+            await asyncio.to_thread(_record_analysis, key, analysis)
+            face = analysis.landmarks, analysis.size
+        item.update(status=200, face=face)
+    except QualityRejected as e:
+        detail = e.detail()
+        item.update(status=422, error=detail["message"], reason=detail["reason"], quality=detail["quality"])
+    except DecodeError as e:
+        item.update(status=415, error=str(e))
+    except Exception as e:
+        logger.exception("Error processing subject shot %s: %s", filename, e)
+        item.update(status=500, error=str(e))
+    return item
+
+def _split_shots(shots: Optional[str]) -> List[str]:
+    return [key.strip() for key in (shots or "").split(",") if key.strip()]
+
+async def _score_subject(keys: List[str], uploads: List[tuple], names: List[str]) -> dict:
+    """Collects every shot's mesh, then aligns and aggregates the usable ones in one pass."""
+    if not 1 <= len(keys) + len(uploads) <= MAX_SHOTS:
+        raise HTTPException(status_code=422, detail=f"A subject needs between 1 and {MAX_SHOTS} shots.")
+    items = []
+    for key in keys:
+        face = await asyncio.to_thread(_stored_face, key)
+        items.append({"index": len(items), "key": key, "status": 200, "face": face} if face is not None else
+                     {"index": len(items), "key": key, "status": 404, "error": "No analyzed face for this image."})
+    # Uploaded shots go to the engine pool together, queuing (wait=True) at bulk priority like batch items.
+    items += await asyncio.gather(*(_subject_shot(len(items) + i, filename, contents)
+                                    for i, (filename, contents) in enumerate(uploads)))
+
+    usable = [item for item in items if item["status"] == 200]
+    if not usable:
+        raise HTTPException(status_code=422, detail={"message": "No usable shot of the subject.", "shots": items})
+    faces = [item.pop("face") for item in usable]
+    result = await asyncio.to_thread(aggregate_shots, [mesh for mesh, _ in faces], [size for _, size in faces], names)
+    for item, shot in zip(usable, result["shots"]):
+        item.update(accepted=shot["accepted"], residual=shot["residual"], harmonyScore=shot["harmonyScore"])
+    analysis = dict(result["analysis"], profiles=result["profiles"]) if names else result["analysis"]
+    return {"analysis": analysis, "confidence": result["confidence"], "accepted": result["accepted"],
+            "keys": [item["key"] for item in usable], "shots": items}
+
+@app.post("/subject")
+async def score_subject(files: Optional[List[UploadFile]] = File(None), shots: Optional[str] = None,
+                        profiles: Optional[str] = None):
+    """
+    Scores one person from several photos (images or zip archives in `files`, plus `shots`: comma-
+    separated hashes of images analyzed before). Meshes are Procrustes-aligned, outlier shots are
+    rejected, and every measurement is the median over the remaining shots; `confidence` gives
+    95% intervals per trait. Images seen before are never inferred again. `keys` lists the usable
+    shots' hashes, to pass back as `shots` when adding photos later. `profiles` works as on /analyze.
+    """
+    names = profile_names(profiles)
+    uploads = await asyncio.to_thread(list, _iter_batch_items(files or []))
+    return await _score_subject(_split_shots(shots), uploads, names)
+
+@app.get("/subject")
+async def get_subject(shots: str, profiles: Optional[str] = None):
+    """Aggregate scores of already-analyzed images (`shots`: comma-separated hashes), without uploads or inference."""
+    return await _score_subject(_split_shots(shots), [], profile_names(profiles))
+# Jobs: long analyses (many photos, clips) are submitted once and polled or followed over SSE, so
+# they never hold an HTTP request open. Each image (zip archives are expanded) or clip becomes one job,
+# keyed by its hash: resubmitting the same upload returns the same job.
+def _file_video_key(path: str, top_k: int) -> str:
+    hasher = result_cache.hasher()
+    with open(path, "rb") as f:
+        while chunk := f.read(1 << 20):
+            hasher.update(chunk)
+    return _video_key(hasher, top_k)
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+async def execute_job(job: dict):
+    """Runs one claimed job at BULK priority and records its result or error in the job store."""
+    path = job_store.input_path(job["digest"])
+    try:
+        if job["kind"] == "video":
+            top_k = job["params"]["top_k"]
+            result = await run_video(path, top_k, await asyncio.to_thread(_file_video_key, path, top_k), priority=BULK)
+            if result is None:
+                return await asyncio.to_thread(job_store.fail, job["id"], 422, "No face detected in any frame of the video.")
+        else:
+            morphology_data = await run_analysis(await asyncio.to_thread(_read_file, path), wait=True,
+                                                 key=job["digest"], priority=BULK)
+            if not morphology_data:
+                return await asyncio.to_thread(job_store.fail, job["id"], 422, "No face detected or image unclear.")
+            report, mesh, _ = morphology_data
+            result = {"analysis": report, "mesh": mesh_to_text(mesh)}
+    except QualityRejected as e:
+        return await asyncio.to_thread(job_store.fail, job["id"], 422, e.detail())
+    except FileNotFoundError:
+        return await asyncio.to_thread(job_store.fail, job["id"], 410, "The job's upload is gone; submit it again.")
+    except ValueError as e:
+        return await asyncio.to_thread(job_store.fail, job["id"], 422, str(e))
+    await asyncio.to_thread(job_store.finish, job["id"], result)
+
+def _submit_uploads(files: List[UploadFile], top_k: int) -> List[dict]:
+    """Stores every upload in the job store and queues one job per image or clip (runs in a thread)."""
+    from engine.uploads import sniff_image
+    entries = []
+    for f in files:
+        if _is_video(f):
+            digest = job_store.save_input_file(f.file)
+            job, _ = job_store.submit("video", digest, {"top_k": top_k}, f.filename or "", priority=BULK)
+            entries.append(job)
+            continue
+        for name, contents in _iter_batch_items([f]):
+            if isinstance(contents, Exception):
+                entries.append({"filename": name, "status": "rejected", "error": {"status": 400, "detail": str(contents)}})
+            elif sniff_image(bytes(contents[:32])) is None:
+                entries.append({"filename": name, "status": "rejected",
+                                "error": {"status": 415, "detail": "Unsupported file type. Please upload an image."}})
+            else:
+                digest = result_cache.key(contents)
+                job, _ = job_store.submit("image", digest, {}, name, priority=BULK, data=contents)
+                entries.append(job)
+    return entries
+
+@app.post("/jobs", status_code=202)
+async def submit_jobs(files: List[UploadFile] = File(...), top_k: int = 3):
+    """
+    Queues images, zip archives of images and video clips for background analysis. Returns one job per
+    image or clip; follow them with GET /jobs/{id}, GET /jobs/events?ids=... (server-sent events) and
+    fetch results from GET /jobs/{id}/result. Jobs survive restarts and yield to interactive requests.
+    """
+    jobs = await asyncio.to_thread(_submit_uploads, files, top_k)
+    job_runner.notify()
+    return {"jobs": jobs}
+
+@app.get("/jobs/events")
+async def job_events(ids: str, poll: float = 0.5):
+    """
+    Server-sent events for a set of jobs (comma-separated `ids`): a `job` event whenever one changes
+    state, a `progress` event with done/total counts, and `end` once every job has finished.
+    """
+    job_ids = [i for i in ids.split(",") if i]
+    if not job_ids:
+        raise HTTPException(status_code=422, detail="No job ids given.")
+    known = await asyncio.to_thread(job_store.get_many, job_ids)
+    if len(known) != len(set(job_ids)):
+        raise HTTPException(status_code=404, detail="Unknown job id.")
+    poll = min(max(poll, 0.1), 5.0)
+
+    async def stream():
+        seen = {}
+        idle = 0.0
+        while True:
+            jobs = await asyncio.to_thread(job_store.get_many, job_ids)
+            changed = [j for j in jobs if seen.get(j["id"]) != (j["status"], j["updated"])]
+            for job in changed:
+                seen[job["id"]] = (job["status"], job["updated"])
+                yield b"event: job\ndata: " + dumps(job) + b"\n\n"
+            done = sum(j["status"] in TERMINAL for j in jobs)
+            if changed:
+                idle = 0.0
+                yield b"event: progress\ndata: " + dumps({"done": done, "total": len(jobs)}) + b"\n\n"
+            elif idle >= 15:
+                idle = 0.0
+                yield b": keep-alive\n\n"
+            if done == len(jobs):
+                yield b"event: end\ndata: {}\n\n"
+                return
+            await asyncio.sleep(poll)
+            idle += poll
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = await asyncio.to_thread(job_store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job id.")
+    return job
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(request: Request, job_id: str, landmarks: LandmarkMode = "full",
+                         encoding: LandmarkEncoding = "json"):
+    """
+    The finished job's result, shaped like the matching synchronous endpoint (/analyze or
+    /analyze/video, same landmark options). 202 with the job's state while it is still pending; a
+    failed job answers with its original error status and detail.
+    """
+    job = await asyncio.to_thread(job_store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job id.")
+    if job["status"] == "failed":
+        raise HTTPException(status_code=job["error"]["status"], detail=job["error"]["detail"])
+    if job["status"] != "done":
+        return JSONResponse(job, status_code=202)
+    result = await asyncio.to_thread(job_store.result, job_id)
+    if job["kind"] == "video":
+        return respond(request, lambda binary: render_video(result, landmarks, encoding, binary))
+    mesh = mesh_from_text(result["mesh"])
+    return respond(request, lambda binary: {
+        "analysis": render_analysis(result["analysis"], mesh, landmarks, encoding, binary)
+    })
+
+# Live streaming: each WebSocket session owns a VIDEO-mode landmarker; MORPH_STREAM_SESSIONS caps them.
+stream_slots = asyncio.Semaphore(int(os.environ.get("MORPH_STREAM_SESSIONS", 4)))
+
+@app.websocket("/stream")
+async def stream_analysis(websocket: WebSocket, score_hz: float = 5.0, smoothing: float = 0.6, landmarks: bool = True):
+    """
+    Live analysis over a WebSocket. The client sends encoded frames (JPEG/PNG/WebP) as binary messages
+    and receives one JSON message per processed frame. Frames that arrive while the previous one is
+    still being processed replace each other, so only the newest is analyzed (stale frames are dropped).
+    """
+    await websocket.accept()
+    if stream_slots.locked():
+        await websocket.close(code=1013, reason="Too many live sessions, try again later.")
+        return
+
+    async with stream_slots:
+        from engine.stream import StreamSession  # MediaPipe is only needed in this process for streaming
+        session = await asyncio.to_thread(StreamSession, score_hz, smoothing)
+        latest = None
+        dropped = 0
+        closed = False
+        frame_ready = asyncio.Event()
+
+        async def receive_frames():
+            nonlocal latest, dropped, closed
+            try:
+                while True:
+                    frame = await websocket.receive_bytes()
+                    if latest is not None:
+                        dropped += 1
+                    latest = frame
+                    frame_ready.set()
+            except (WebSocketDisconnect, RuntimeError, KeyError):
+                closed = True
+                frame_ready.set()
+
+        receiver = asyncio.create_task(receive_frames())
+        try:
+            while True:
+                await frame_ready.wait()
+                frame_ready.clear()
+                if closed:
+                    break
+                frame, latest = latest, None
+                if frame is None:
+                    continue
+                try:
+                    message = await asyncio.to_thread(session.process_frame, frame, landmarks)
+                except Exception as e:
+                    message = {"error": str(e)}
+                message["dropped"] = dropped
+                await websocket.send_json(message)
+        except WebSocketDisconnect:
+            pass
+        finally:
+            receiver.cancel()
+            await asyncio.to_thread(session.close)
+
 @app.get("/debug/calibration")
 def get_calibration_data():
     """Generates a synthetic image and matching landmarks for alignment verification."""
-    # 1. Create a 600x600 White Canvas
-    W, H = 600, 600
-    img = Image.new('RGB', (W, H), color='white')
-    draw = ImageDraw.Draw(img)
-    
-    # 2. Draw Visual Markers (Reference Truth)
-    # Center Green Circle
-    cx, cy = W//2, H//2
-    draw.ellipse([cx-10, cy-10, cx+10, cy+10], fill='green', outline='black')
-    
-    # Target Box (to show object-fit limits)
-    draw.rectangle([0, 0, W-1, H-1], outline='black', width=5)
-    
-    # Corner Red Crosses
-    # Top-Left (0,0)
-    draw.line([0, 0, 50, 50], fill='red', width=3)
-    draw.line([0, 50, 50, 0], fill='red', width=3)
-    
-    # Bottom-Right (1,1)
-    draw.line([W-50, H-50, W, H], fill='red', width=3)
-    draw.line([W-50, H, W, H-50], fill='red', width=3)
-    
-    # Hairline Bar (Blue) at 5% height
-    hy = int(H * 0.05)
-    draw.line([0, hy, W, hy], fill='blue', width=2)
-    
-    # 3. Create Landmark Data that MATCHES exactly
-    # Normalized coordinates [0.0, 1.0]
-    landmarks = []
-    
-    # Center point (matches green circle)
-    landmarks.append({"x": 0.5, "y": 0.5, "z": 0})
-    
-    # "Hairline" points (match blue line)
-    # 5 points across
-    for i in range(5):
-        landmarks.append({"x": 0.1 + (i * 0.2), "y": 0.05, "z": 0})
-        
-    # Corner markers (Exact corners)
-    landmarks.append({"x": 0.0, "y": 0.0, "z": 0})
-    landmarks.append({"x": 1.0, "y": 1.0, "z": 0})
+    from engine.synthetic import calibration_canvas
+    img, landmarks = calibration_canvas(600, 600)
     
-    # 4. Serialize Image to Base64
+    # Serialize Image to Base64
     buf = io.BytesIO()
     img.save(buf, format='PNG')
     img_b64 = base64.b64encode(buf.getvalue()).decode('utf-8')
@@ -125,4 +1066,5 @@ def get_calibration_data():
     }
 
 if __name__ == "__main__":
+    import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
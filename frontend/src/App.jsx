@@ -11,7 +11,7 @@ function App() {
   useEffect(() => {
     const checkServer = async () => {
       try {
-        const res = await fetch('http://localhost:8000/');
+        const res = await fetch('http://localhost:8000/health/ready');
         if (res.ok) {
           setServerStatus('online');
           setRestarting(false);
@@ -31,10 +31,14 @@ function App() {
     setRestarting(true);
     setServerStatus('checking');
     try {
-      await fetch('http://localhost:8000/restart', { method: 'POST' });
+      // Resolves once the reloaded engines are warmed and swapped in; the server stays up meanwhile.
+      const res = await fetch('http://localhost:8000/restart', { method: 'POST' });
+      if (res.ok) {
+        setServerStatus('online');
+        setRestarting(false);
+      }
     } catch (err) {
-      // It will fail because the server closes the connection on restart
-      console.log("Server restarting...");
+      console.log("Engine reload failed, waiting for the server...");
     }
   };
 
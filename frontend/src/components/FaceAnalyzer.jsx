@@ -2,6 +2,19 @@ import { useState, useRef } from 'react';
 import { Upload, Loader2, RefreshCw, Bug, Microscope } from 'lucide-react';
 import MorphologyReport from './MorphologyReport';
 
+// /analyze?encoding=f32 sends landmarks as a base64 little-endian float32 array of [x, y, z] rows,
+// which is several times smaller and faster to parse than a list of point objects.
+const unpackLandmarks = (packed) => {
+    if (!packed || Array.isArray(packed)) return packed;
+    const bytes = Uint8Array.from(atob(packed.data), (c) => c.charCodeAt(0));
+    const values = new Float32Array(bytes.buffer);
+    const points = new Array(packed.shape[0]);
+    for (let i = 0; i < points.length; i++) {
+        points[i] = { x: values[i * 3], y: values[i * 3 + 1], z: values[i * 3 + 2] };
+    }
+    return points;
+};
+
 export default function FaceAnalyzer() {
     const [image, setImage] = useState(null);
     const [analyzing, setAnalyzing] = useState(false);
@@ -60,17 +73,19 @@ export default function FaceAnalyzer() {
             const formData = new FormData();
             formData.append('file', blob);
 
-            const response = await fetch('http://localhost:8000/analyze', {
+            const response = await fetch('http://localhost:8000/analyze?encoding=f32', {
                 method: 'POST',
                 body: formData,
             });
 
             if (!response.ok) {
                 const err = await response.json().catch(() => ({ detail: response.statusText }));
-                throw new Error(err.detail || 'Analysis failed');
+                // Quality-gate rejections carry { reason, message, quality } as their detail.
+                throw new Error(err.detail?.message || err.detail || 'Analysis failed');
             }
 
             const data = await response.json();
+            data.analysis.landmarks = unpackLandmarks(data.analysis.landmarks);
             setAnalysisData(data.analysis);
 
             // Use Backend Landmarks for perfect visualization alignment
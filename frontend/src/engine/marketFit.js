@@ -1,66 +1,36 @@
-// Market Profiles - Defined by Ideal Ranges (Mean) and Tolerance (Std Dev)
-const MARKETS = {
-    editorial: {
-        description: "High fashion, sharp features, unconventional beauty.",
-        bounty: {
-            fWHR: { mean: 1.9, std: 0.15 },
-            canthalTilt: { mean: 6, std: 4 },
-            jawToCheekRatio: { mean: 0.9, std: 0.1 },
-            midToLowerRatio: { mean: 1.0, std: 0.2 },
-        }
-    },
-    commercial: {
-        description: "Approachable, classic beauty, balanced proportions.",
-        bounty: {
-            fWHR: { mean: 1.75, std: 0.08 },
-            canthalTilt: { mean: 2, std: 2 },
-            jawToCheekRatio: { mean: 0.8, std: 0.05 },
-            midToLowerRatio: { mean: 1.0, std: 0.1 },
-        }
-    },
-    character: {
-        description: "Unconventional features, distinct deviations.",
-        bounty: {
-            fWHR: { mean: 1.75, std: 0.3 },
-            canthalTilt: { mean: 0, std: 10 },
-            jawToCheekRatio: { mean: 0.75, std: 0.2 },
-        }
-    }
-};
-
-function gaussian(x, mean, std) {
-    return (1 / (std * Math.sqrt(2 * Math.PI))) * Math.exp(-0.5 * Math.pow((x - mean) / std, 2));
-}
-
-function computeScore(metrics, profile) {
-    let scoreSum = 0;
-    let weightSum = 0;
-
-    for (const [trait, stats] of Object.entries(profile.bounty)) {
-        if (metrics[trait] === undefined) continue;
+// Market profiles (editorial, commercial, character) are scoring profiles on the backend
+// (GET /profiles); they are evaluated there so every client scores markets like the engine does.
+const MARKETS = ['editorial', 'commercial', 'character'];
 
-        const val = parseFloat(metrics[trait]);
-        const p = gaussian(val, stats.mean, stats.std);
-        const maxP = gaussian(stats.mean, stats.mean, stats.std);
-
-        // Normalized score 0-1 for this trait
-        const matchScore = p / maxP;
+// Report field -> metric column the profiles read.
+const MEASUREMENTS = {
+    fWHR: 'fwhr', canthalTilt: 'avg_eye_tilt', jawToCheekRatio: 'jaw_ratio', midToLowerRatio: 'mid_lower_ratio'
+};
 
-        scoreSum += matchScore;
-        weightSum += 1;
+async function scoreMarkets(rawMetrics) {
+    const params = new URLSearchParams({ profiles: MARKETS.join(',') });
+    for (const [field, column] of Object.entries(MEASUREMENTS)) {
+        if (rawMetrics[field] !== undefined) params.append(column, parseFloat(rawMetrics[field]));
     }
-
-    return weightSum > 0 ? (scoreSum / weightSum) : 0;
+    const response = await fetch(`http://localhost:8000/profiles/score?${params}`);
+    if (!response.ok) return null;
+    return response.json();
 }
 
-export function calculateMarketFit(rawMetrics) {
+/**
+ * Fit of a face to each market profile.
+ * @param {Object} rawMetrics - Raw trait values, named like the /analyze report fields
+ * @returns {Promise<Object|null>} { market: { score (0-100), description } }
+ */
+export async function calculateMarketFit(rawMetrics) {
     if (!rawMetrics) return null;
+    const scores = await scoreMarkets(rawMetrics);
+    if (!scores) return null;
     const results = {};
-    for (const [marketName, profile] of Object.entries(MARKETS)) {
-        const avgFit = computeScore(rawMetrics, profile);
-        results[marketName] = {
-            score: Math.round(avgFit * 100),
-            description: profile.description
+    for (const market of MARKETS) {
+        results[market] = {
+            score: Math.round(scores[market].score ?? 0),
+            description: scores[market].description
         };
     }
     return results;
@@ -68,10 +38,10 @@ export function calculateMarketFit(rawMetrics) {
 
 /**
  * Calculates a "Potential Score" simulating reduced facial puffiness.
- * Hypothesis: Lower body fat / puffiness increases Jaw Definition (JawToCheekRatio) 
+ * Hypothesis: Lower body fat / puffiness increases Jaw Definition (JawToCheekRatio)
  * and might slightly affect fWHR perception (more angular).
  */
-export function calculatePotential(rawMetrics) {
+export async function calculatePotential(rawMetrics) {
     if (!rawMetrics) return null;
 
     // Simulation: Improve Jaw Definition by 10-15% towards the "Ideal" of 1.0 (squaredness)
@@ -86,8 +56,8 @@ export function calculatePotential(rawMetrics) {
         jawToCheekRatio: projectedJaw
     };
 
-    const current = calculateMarketFit(rawMetrics);
-    const projected = calculateMarketFit(projectedMetrics);
+    const [current, projected] = await Promise.all([calculateMarketFit(rawMetrics), calculateMarketFit(projectedMetrics)]);
+    if (!current || !projected) return null;
 
     const potentialResults = {};
 